@@ -1,18 +1,22 @@
 import customtkinter as ctk
 import tkinter as tk
 from tkinter import filedialog, messagebox
-import fitz  # PyMuPDF
 import os
 from PIL import Image, ImageTk
-import io
-from functools import partial
 import datetime
+import math
 import requests
 import getpass
 import socket
 import threading
+import multiprocessing
 import time
 import queue
+from collections import OrderedDict
+from pdfy import CompressionCancelled, DocumentSession, merge_pdfs, parse_page_spec
+from pdfy.preview import PreviewRenderer, TileRenderer
+from pdfy.render import THUMB_WIDTH, RenderSource
+from pdfy.thumbcache import ThumbnailCache
 #from pylovepdf.ilovepdf import ILovePdf
 
 # Try to import tkinterdnd2 for drag and drop functionality
@@ -23,6 +27,217 @@ except ImportError:
     DRAG_DROP_AVAILABLE = False
     print("tkinterdnd2 not available. Install with: pip install tkinterdnd2")
 
+RESIZE_FRAME_MS = 16    # Interim preview redraws while resizing, at most one per frame
+RESIZE_SETTLE_MS = 150  # Quiet time after the last resize before the full-quality render
+ZOOM_LEVELS = (1, 1.25, 1.5, 2, 3, 4, 6, 8)  # Preview zoom steps; 1 = fit to window
+# MuPDF keeps the GIL while it writes, so say the window may freeze rather than pretend it won't
+SAVING_MESSAGE = "Saving (the window may pause until the file is written)..."
+
+class ThumbnailStrip:
+    """Virtualized page thumbnail list drawn directly on a tk.Canvas.
+
+    Every page gets a fixed-height slot, so index <-> y is plain arithmetic.
+    Only rows in or near the viewport have canvas items, and those items are
+    recycled as the view scrolls; the item count stays constant however many
+    pages the document has. Loaded thumbnails are kept in a bounded LRU.
+    """
+    LABEL_HEIGHT = 18
+    ROW_PAD = 4
+    BUFFER_ROWS = 2
+
+    def __init__(self, canvas, scrollbar, on_press, on_release, on_view_change,
+                 on_evict=None, max_images=300, width=THUMB_WIDTH):
+        self.canvas = canvas
+        self.scrollbar = scrollbar
+        self.on_press = on_press
+        self.on_release = on_release
+        self.on_view_change = on_view_change  # Called with (first, last) visible rows
+        self.on_evict = on_evict
+        self.max_images = max_images
+        self.width = width
+        self.page_count = 0
+        self.slot_height = int(width * 1.414)
+        self.selected = None
+        self.images = OrderedDict()  # page index -> (PIL image, PhotoImage), most recent last
+        self.rows = {}   # page index -> (bg, image, label) items currently materialized
+        self.spare = []  # Recycled item triples
+        self._press_index = None
+        canvas.configure(yscrollcommand=self._on_yview)
+        canvas.bind('<Configure>', lambda e: self.update_view())
+        canvas.bind('<ButtonPress-1>', self._on_button_press)
+        canvas.bind('<ButtonRelease-1>', self._on_button_release)
+
+    @property
+    def row_height(self):
+        return self.slot_height + self.LABEL_HEIGHT + self.ROW_PAD
+
+    def reset(self, page_count, slot_height=None):
+        """Drop every row and image and lay out page_count empty slots."""
+        for items in self.rows.values():
+            self._hide(items)
+            self.spare.append(items)
+        self.rows.clear()
+        self.images.clear()
+        self.page_count = page_count
+        if slot_height:
+            self.slot_height = slot_height
+        self.canvas.configure(scrollregion=(0, 0, self.width + 40, page_count * self.row_height))
+        self.canvas.yview_moveto(0)
+        self.update_view()
+
+    def remap(self, page_count, new_index, slot_height=None):
+        """Follow a structural edit without dropping loaded thumbnails.
+
+        new_index(old) gives the page's index after the edit, or None when it
+        is gone or changed; those thumbnails are dropped, the rest move with
+        their pages. The scroll position is kept.
+        """
+        restyle = slot_height and slot_height != self.slot_height
+        if slot_height:
+            self.slot_height = slot_height
+        images = OrderedDict()
+        for old, (pil_img, photo) in self.images.items():
+            new = new_index(old)
+            if new is not None and 0 <= new < page_count:
+                images[new] = (pil_img, self._photo(pil_img) if restyle else photo)
+        self.images = images
+        for items in self.rows.values():
+            self._hide(items)
+            self.spare.append(items)
+        self.rows.clear()
+        self.page_count = page_count
+        self.canvas.configure(scrollregion=(0, 0, self.width + 40, page_count * self.row_height))
+        self.update_view()
+
+    def row_top(self, index):
+        return index * self.row_height
+
+    def row_at(self, content_y):
+        """Page index under a canvas (content) y coordinate, or None."""
+        index = int(content_y // self.row_height)
+        return index if 0 <= index < self.page_count else None
+
+    def visible_range(self):
+        top = self.canvas.canvasy(0)
+        bottom = self.canvas.canvasy(self.canvas.winfo_height())
+        first = max(0, int(top // self.row_height))
+        last = min(self.page_count - 1, int(bottom // self.row_height))
+        return first, last
+
+    def has_image(self, index):
+        return index in self.images
+
+    def source_image(self, index):
+        """The PIL thumbnail of a page, if loaded (a placeholder for the full preview)."""
+        entry = self.images.get(index)
+        return entry[0] if entry else None
+
+    def set_image(self, index, pil_img):
+        if not 0 <= index < self.page_count:
+            return
+        self.images[index] = (pil_img, self._photo(pil_img))
+        self.images.move_to_end(index)
+        while len(self.images) > self.max_images:
+            evicted, _ = self.images.popitem(last=False)
+            if evicted in self.rows:
+                self._draw(evicted, self.rows[evicted])
+            if self.on_evict:
+                self.on_evict(evicted)
+        if index in self.rows:
+            self._draw(index, self.rows[index])
+
+    def set_selected(self, index):
+        previous, self.selected = self.selected, index
+        for i in (previous, index):
+            if i in self.rows:
+                self._draw(i, self.rows[i])
+
+    def ensure_visible(self, index, margin=5):
+        total = self.page_count * self.row_height
+        canvas_h = self.canvas.winfo_height()
+        if not 0 <= index < self.page_count or total <= canvas_h:
+            return
+        y = self.row_top(index)
+        top_visible = self.canvas.canvasy(0)
+        bottom_visible = self.canvas.canvasy(canvas_h)
+        if y < (top_visible + margin) or (y + self.row_height) > (bottom_visible - margin):
+            # Scroll to center the thumbnail
+            target_y = max(0, y - (canvas_h / 2) + (self.row_height / 2))
+            self.canvas.yview_moveto(target_y / total)
+
+    def update_view(self):
+        """Materialize rows for the viewport (plus a small buffer) and recycle the rest."""
+        if not self.page_count:
+            return
+        first, last = self.visible_range()
+        wanted = range(max(0, first - self.BUFFER_ROWS), min(self.page_count, last + self.BUFFER_ROWS + 1))
+        for index in [i for i in self.rows if i not in wanted]:
+            items = self.rows.pop(index)
+            self._hide(items)
+            self.spare.append(items)
+        for index in wanted:
+            if index not in self.rows:
+                self.rows[index] = self.spare.pop() if self.spare else self._create_items()
+                self._draw(index, self.rows[index])
+        self.on_view_change(first, last)
+
+    def _photo(self, pil_img):
+        shown = pil_img
+        if shown.height > self.slot_height:
+            # Letterbox pages taller than the slot
+            shown = shown.copy()
+            shown.thumbnail((self.width, self.slot_height), Image.LANCZOS)
+        return ImageTk.PhotoImage(shown)
+
+    def _create_items(self):
+        bg = self.canvas.create_rectangle(0, 0, 0, 0, width=0)
+        image = self.canvas.create_image(0, 0, anchor="center")
+        label = self.canvas.create_text(0, 0, font=("Arial", 10, "bold"))
+        # Keep drag highlight lines and other overlays above the rows
+        for item in (label, image, bg):
+            self.canvas.tag_lower(item)
+        return bg, image, label
+
+    def _hide(self, items):
+        for item in items:
+            self.canvas.itemconfigure(item, state="hidden")
+
+    def _draw(self, index, items):
+        bg, image, label = items
+        top = self.row_top(index) + self.ROW_PAD // 2
+        x0 = (int(self.canvas.cget("width")) - self.width) // 2
+        x1 = x0 + self.width
+        photo = self.images[index][1] if index in self.images else None
+        selected = index == self.selected
+        if photo is None:
+            fill, text_fill = "#d0d0d0", "#666"  # Placeholder until the thumbnail arrives
+        elif selected:
+            fill, text_fill = "#1976D2", "white"
+        else:
+            fill, text_fill = "#f0f0f0", "#222"
+        self.canvas.coords(bg, x0 - 3, top, x1 + 3, top + self.slot_height + self.LABEL_HEIGHT)
+        self.canvas.itemconfigure(bg, fill=fill, state="normal")
+        self.canvas.coords(image, (x0 + x1) // 2, top + self.slot_height // 2 + 1)
+        self.canvas.itemconfigure(image, image=photo or "", state="normal" if photo else "hidden")
+        self.canvas.coords(label, (x0 + x1) // 2, top + self.slot_height + self.LABEL_HEIGHT // 2)
+        self.canvas.itemconfigure(label, text=f"{index+1}", fill=text_fill, state="normal")
+
+    def _on_yview(self, first, last):
+        self.scrollbar.set(first, last)
+        self.update_view()
+
+    def _on_button_press(self, event):
+        self._press_index = self.row_at(self.canvas.canvasy(event.y))
+        if self._press_index is not None:
+            self.on_press(event, idx=self._press_index)
+
+    def _on_button_release(self, event):
+        # Like a button, the release belongs to the row that was pressed
+        index, self._press_index = self._press_index, None
+        if index is not None:
+            self.on_release(event, idx=index)
+
+
 class PDFEditorApp(ctk.CTk if not DRAG_DROP_AVAILABLE else TkinterDnD.Tk):
     def __init__(self):
         # Expiry check
@@ -36,23 +251,43 @@ class PDFEditorApp(ctk.CTk if not DRAG_DROP_AVAILABLE else TkinterDnD.Tk):
         self.geometry("1200x800")
         ctk.set_appearance_mode("dark")
         ctk.set_default_color_theme("blue")
-        self.pdf_path = None
-        self.pdf_temp_path = None  # Track the temp file path
-        self.pdf_doc = None
+        self.session = None  # DocumentSession holding the open PDF
+        self.render_source = None  # Thread-safe view of the session for thumbnail workers
+        self.preview_renderer = None  # Background, cached renders for the page preview
+        self._wanted_preview = None  # (page, width, height) the preview is waiting for
+        self._resize_frame_job = None   # Pending interim redraw while resizing
+        self._resize_settle_job = None  # Pending final render once resizing stops
+        self.tile_renderer = None  # Renders visible tiles of the preview when zoomed in
+        self.preview_zoom = 1  # Relative to fit-to-window
+        self._zoom_origin = (0, 0)  # Top-left of the view in zoomed page pixels
+        self._zoom_view = None  # (generation, page, scale, visible tiles, dx, dy) on the canvas
+        self._zoom_photos = {}  # Tile key -> PhotoImage for tiles on the canvas
+        self._zoom_backdrop = None
+        self._zoom_redraw_job = None
+        self._pan_start = None
+        self._saving = False  # A save (or another background task) is running on a worker thread
+        self._queued_edits = []  # Edits made during a save, applied once it finishes
+        self._close_after_save = False
+        self.task_queue = queue.Queue()  # (label, fraction or None) progress posted by the running task
+        self._task_cancel = None  # threading.Event of a cancellable running task
         self.selected_page = None
-        self.thumbnail_images = []  # Keep references to avoid garbage collection
-        self.thumbnail_buttons = []  # Store references to thumbnail buttons
-        self.thumbnail_labels = []   # Store references to page number labels
+        self._loaded_thumbnails = set()  # Pages whose thumbnail is queued or shown since the last edit
+        self._thumb_pending = []  # Pages of the running thumbnail request
         self.current_pil_image = None  # Store the current PIL image for resizing
         self.drag_data = {'from_idx': None, 'start_y': None, 'press_y': None, 'click_timer': None, 'moved': False, 'highlight_line': None, 'target_idx': None}
-        self.undo_stack = []  # Store previous PDF states as bytes
-        self.redo_stack = []  # Store redo PDF states as bytes
         self.is_merged_pdf = False  # Track if current PDF is a merged temp
         # self.notification_label = None  # Remove label, use floating notification
         self.protocol("WM_DELETE_WINDOW", self.on_close)  # Ensure temp file is deleted on close
         
         self.thumb_queue = queue.Queue()
+        try:
+            self.thumb_cache = ThumbnailCache()  # Persistent across runs
+        except OSError:
+            self.thumb_cache = None
         self._check_thumbnail_queue()  # Start polling loop
+        self.preview_queue = queue.Queue()
+        self.tile_queue = queue.Queue()
+        self._check_preview_queue()
         
         self.init_ui()
         # Fix full screen reliably
@@ -65,6 +300,19 @@ class PDFEditorApp(ctk.CTk if not DRAG_DROP_AVAILABLE else TkinterDnD.Tk):
         # Bind undo/redo shortcuts
         self.bind_all('<Control-z>', self._on_undo)
         self.bind_all('<Control-y>', self._on_redo)
+        # Bind preview zoom shortcuts
+        self.bind_all('<Control-plus>', lambda e: self._step_zoom(1))
+        self.bind_all('<Control-equal>', lambda e: self._step_zoom(1))
+        self.bind_all('<Control-minus>', lambda e: self._step_zoom(-1))
+        self.bind_all('<Control-0>', lambda e: self._set_zoom(1))
+
+    @property
+    def pdf_doc(self):
+        return self.session.doc if self.session else None
+
+    @property
+    def pdf_path(self):
+        return self.session.path if self.session else None
 
     def init_ui(self):
         # Sidebar for file actions
@@ -74,6 +322,11 @@ class PDFEditorApp(ctk.CTk if not DRAG_DROP_AVAILABLE else TkinterDnD.Tk):
         open_btn.pack(pady=20, padx=20, fill=tk.X)
         self.save_over_btn = ctk.CTkButton(sidebar, text="Save", command=self.save_overwrite)
         self.save_over_btn.pack(pady=10, padx=20, fill=tk.X)
+        # Save appends edits to the file; compacting rewrites it without leftovers
+        self.compact_on_save = tk.BooleanVar(value=False)
+        compact_check = ctk.CTkCheckBox(sidebar, text="Compact on save", variable=self.compact_on_save,
+                                        font=("Arial", 11), checkbox_width=18, checkbox_height=18)
+        compact_check.pack(pady=(0, 10), padx=20, fill=tk.X)
         save_btn = ctk.CTkButton(sidebar, text="Save As", command=self.save_pdf)
         save_btn.pack(pady=10, padx=20, fill=tk.X)
         insert_btn = ctk.CTkButton(sidebar, text="Insert", command=self.insert_page)
@@ -126,10 +379,10 @@ class PDFEditorApp(ctk.CTk if not DRAG_DROP_AVAILABLE else TkinterDnD.Tk):
         self.thumb_scrollbar = ctk.CTkScrollbar(thumb_frame, orientation=tk.VERTICAL, command=self.thumb_canvas.yview)
         self.thumb_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.thumb_canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        self.thumb_canvas.configure(yscrollcommand=self.thumb_scrollbar.set)
-        self.thumbs_inner = tk.Frame(self.thumb_canvas, bg="#393e46")
-        self.thumb_canvas.create_window((0,0), window=self.thumbs_inner, anchor="nw")
-        self.thumbs_inner.bind("<Configure>", lambda e: self.thumb_canvas.configure(scrollregion=self.thumb_canvas.bbox("all")))
+        self.thumb_strip = ThumbnailStrip(self.thumb_canvas, self.thumb_scrollbar,
+                                          on_press=self._on_thumb_press, on_release=self._on_thumb_release,
+                                          on_view_change=self._on_thumb_view_change,
+                                          on_evict=self._loaded_thumbnails.discard)
         self.thumb_canvas.bind_all("<MouseWheel>", self._on_mousewheel)
 
         # PDF page preview (no scrollbars)
@@ -139,6 +392,9 @@ class PDFEditorApp(ctk.CTk if not DRAG_DROP_AVAILABLE else TkinterDnD.Tk):
         self.preview_canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         self.preview_canvas.bind("<MouseWheel>", self._on_preview_page_scroll)
         self.preview_canvas.bind("<Configure>", self._on_preview_canvas_resize)
+        self.preview_canvas.bind("<ButtonPress-1>", self._on_preview_press)
+        self.preview_canvas.bind("<B1-Motion>", self._on_preview_drag)
+        self.preview_canvas.bind("<ButtonRelease-1>", lambda e: setattr(self, '_pan_start', None))
         # Enable native drag and drop for PDF files
         self._setup_drag_drop()
         # Page number display and Go to Page
@@ -152,13 +408,29 @@ class PDFEditorApp(ctk.CTk if not DRAG_DROP_AVAILABLE else TkinterDnD.Tk):
         self.goto_entry.bind('<Return>', lambda event: self._goto_page())
         goto_btn = ctk.CTkButton(nav_frame, text="Go", width=40, command=self._goto_page)
         goto_btn.pack(side=tk.LEFT, padx=5)
+        # Background task indicator, packed only while a task runs
+        self.task_progress = ctk.CTkProgressBar(nav_frame, mode="indeterminate", width=140)
+        self.task_label = ctk.CTkLabel(nav_frame, text="", font=("Arial", 12), text_color="#eeeeee")
+        self.task_cancel_btn = ctk.CTkButton(nav_frame, text="Cancel", width=60, command=self._cancel_task)
 
     def _on_mousewheel(self, event):
         self.thumb_canvas.yview_scroll(int(-1*(event.delta/120)), "units")
 
     def _on_preview_page_scroll(self, event):
+        # "break" keeps the bind_all wheel handler from also scrolling the thumbnails
         if not self.pdf_doc:
-            return
+            return "break"
+        if event.state & 0x0004:
+            # Ctrl+wheel zooms around the cursor
+            self._step_zoom(1 if event.delta > 0 else -1, (event.x, event.y))
+            return "break"
+        if self.preview_zoom > 1:
+            # Zoomed in: the wheel pans instead of turning pages (Shift pans sideways)
+            step = -int(event.delta / 120) * 120
+            ox, oy = self._zoom_origin
+            self._zoom_origin = (ox + step, oy) if event.state & 0x0001 else (ox, oy + step)
+            self._schedule_zoom_redraw()
+            return "break"
         if event.delta > 0:
             # Scroll up: previous page
             if self.selected_page is not None and self.selected_page > 0:
@@ -167,43 +439,52 @@ class PDFEditorApp(ctk.CTk if not DRAG_DROP_AVAILABLE else TkinterDnD.Tk):
             # Scroll down: next page
             if self.selected_page is not None and self.selected_page < len(self.pdf_doc) - 1:
                 self.show_page(self.selected_page + 1)
+        return "break"
 
     def _on_preview_canvas_resize(self, event):
-        # Re-render the current page to fit the new canvas size
-        if self.current_pil_image is not None:
-            self._display_pil_image_on_canvas(self.current_pil_image)
+        # <Configure> fires for every pixel of a drag: redraw at most once per
+        # frame with a cheap resample, and render properly once it settles
+        if self.current_pil_image is None or self.selected_page is None:
+            return
+        if self._resize_frame_job is None:
+            self._resize_frame_job = self.after(RESIZE_FRAME_MS, self._redraw_resized_preview)
+        if self._resize_settle_job is not None:
+            self.after_cancel(self._resize_settle_job)
+        self._resize_settle_job = self.after(RESIZE_SETTLE_MS, self._render_resized_preview)
+
+    def _redraw_resized_preview(self):
+        self._resize_frame_job = None
+        # A zoomed view keeps its tiles until the resize settles
+        if self.current_pil_image is not None and self.preview_zoom == 1:
+            self._display_pil_image_on_canvas(self.current_pil_image, Image.BILINEAR)
+
+    def _render_resized_preview(self):
+        self._resize_settle_job = None
+        if self.pdf_doc and self.selected_page is not None:
+            # Keep the interim image up rather than flashing back to a thumbnail
+            self._render_preview(self.selected_page, placeholder=False)
 
     def open_pdf(self, path=None, is_merged=False):
-        import shutil, tempfile, uuid
+        if self._busy():
+            return
         if path is None:
             path = filedialog.askopenfilename(filetypes=[("PDF Files", "*.pdf")])
             if not path:
                 return
-        # Clean up previous temp file if any
-        if self.pdf_doc:
-            try:
-                self.pdf_doc.close()
-            except Exception:
-                pass
-        if self.pdf_temp_path and os.path.exists(self.pdf_temp_path):
-            try:
-                os.remove(self.pdf_temp_path)
-            except Exception:
-                pass
+        # Close the previous document and its temp file if any
+        self._close_session()
         try:
-            # Always create temp file in system temp dir
-            base, ext = os.path.splitext(os.path.basename(path))
-            temp_dir = tempfile.gettempdir()
-            temp_path = os.path.join(temp_dir, f"pdfeditor_{uuid.uuid4().hex}{ext}")
-            shutil.copy2(path, temp_path)
-            self.pdf_temp_path = temp_path
-            self.pdf_doc = fitz.open(self.pdf_temp_path)
-            self.pdf_path = path
+            # Pages are read from the file as needed, so page 1 shows at once
+            # however large it is; the session handles saving over it
+            self.session = DocumentSession.open(path)
+            self.render_source = RenderSource(self.session)
+            self.preview_renderer = PreviewRenderer(
+                self.render_source, on_ready=lambda key, img, final: self.preview_queue.put((key, img, final)))
+            self.tile_renderer = TileRenderer(
+                self.render_source, on_ready=lambda key, img: self.tile_queue.put((key, img)))
             self.is_merged_pdf = is_merged
             self.refresh_thumbnails()
             self.show_page(0)
-            self.undo_stack.clear()
-            self.redo_stack.clear()
             self._update_undo_redo_btn_state()
             self._update_save_btn_state()
             self._update_path_display()
@@ -211,10 +492,29 @@ class PDFEditorApp(ctk.CTk if not DRAG_DROP_AVAILABLE else TkinterDnD.Tk):
             messagebox.showerror("Error", f"Failed to open PDF: {e}")
             self._update_path_display()
 
+    def _close_session(self):
+        if not self.session:
+            return
+        self.preview_renderer.close()
+        self.tile_renderer.close()
+        self.session.close()
+        if self.is_merged_pdf:
+            # The merge result lives in the temp dir until saved elsewhere
+            try:
+                os.remove(self.session.path)
+            except OSError:
+                pass
+        self.session = None
+        self.render_source = None
+        self.preview_renderer = None
+        self.tile_renderer = None
+
     def save_pdf(self):
         if not self.pdf_doc:
             messagebox.showwarning("No PDF", "Open a PDF first.")
             return
+        if self._busy():
+            return
         # Prompt for page selection
         input_dialog = tk.Toplevel(self)
         input_dialog.title("Save As - Page Selection")
@@ -232,21 +532,7 @@ class PDFEditorApp(ctk.CTk if not DRAG_DROP_AVAILABLE else TkinterDnD.Tk):
                 result['pages'] = None  # All pages
             else:
                 try:
-                    pages = set()
-                    for part in raw.split(','):
-                        if '-' in part:
-                            start, end = part.split('-')
-                            start, end = int(start), int(end)
-                            if start > end:
-                                raise ValueError
-                            pages.update(range(start, end+1))
-                        else:
-                            pages.add(int(part))
-                    # Convert to zero-based and sort
-                    pages = [p-1 for p in sorted(pages) if 1 <= p <= len(self.pdf_doc)]
-                    if not pages:
-                        raise ValueError
-                    result['pages'] = pages
+                    result['pages'] = parse_page_spec(raw, len(self.pdf_doc))
                 except Exception:
                     messagebox.showerror("Error", "Invalid input. Use e.g. 1,7,8 or 5-9.", parent=input_dialog)
                     return
@@ -260,92 +546,199 @@ class PDFEditorApp(ctk.CTk if not DRAG_DROP_AVAILABLE else TkinterDnD.Tk):
         path = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("PDF Files", "*.pdf")])
         if not path:
             return
-        try:
-            if pages is None:
-                self.pdf_doc.save(path)
-            else:
-                # Save only selected pages
-                new_pdf = fitz.open()
-                for p in pages:
-                    new_pdf.insert_pdf(self.pdf_doc, from_page=p, to_page=p)
-                new_pdf.save(path)
-                new_pdf.close()
+        self._save_as_in_background(path, pages)
+
+    def _save_as_in_background(self, path, pages=None):
+        def on_done(_, error):
+            if error:
+                messagebox.showerror("Error", f"Failed to save PDF: {error}")
+                return
             messagebox.showinfo("Saved", f"PDF saved to {path}")
             # If in merge mode, load the saved PDF as a regular PDF
             if self.is_merged_pdf:
                 self.open_pdf(path, is_merged=False)
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to save PDF: {e}")
+        self._run_background_task(lambda: self.session.save(path, pages), on_done, SAVING_MESSAGE)
 
     def save_overwrite(self):
         if not self.pdf_doc or not self.pdf_path:
             messagebox.showwarning("No PDF", "No PDF file is currently open.")
             return
-        import os, tempfile
+        if self._busy():
+            return
         confirm = messagebox.askyesno("Overwrite PDF", f"Are you sure you want to overwrite the current PDF?\n{self.pdf_path}")
         if not confirm:
             return
-        try:
-            # Save directly to the original path
-            self.pdf_doc.save(self.pdf_path)
+        compact = self.compact_on_save.get()
+
+        def on_done(mode, error):
+            if isinstance(error, (PermissionError, OSError)):
+                # Offer Save As fallback
+                messagebox.showwarning("Access Denied", f"Could not overwrite the original PDF.\nReason: {error}\n\nYou can save to a different location.")
+                path = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("PDF Files", "*.pdf")])
+                if path:
+                    self._save_as_in_background(path)
+                return
+            if error:
+                messagebox.showerror("Error", f"Failed to save PDF: {error}")
+                return
+            # Either way the session rereads the saved file; the pages themselves are unchanged
+            self.update_thumbnails(lambda index: index)
+            self.show_page(self.selected_page)
             messagebox.showinfo("Saved", f"PDF overwritten: {self.pdf_path}")
-        except (PermissionError, OSError) as e:
-            # Offer Save As fallback
-            messagebox.showwarning("Access Denied", f"Could not overwrite the original PDF.\nReason: {e}\n\nYou can save to a different location.")
-            path = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("PDF Files", "*.pdf")])
-            if not path:
+        # Save directly to the original path, appending only the changes when possible
+        self._run_background_task(lambda: self.session.save_in_place(compact=compact), on_done, SAVING_MESSAGE)
+
+    # Background tasks
+
+    def _run_background_task(self, work, on_done, message, cancel=None):
+        """Run work() on a worker thread with a progress indicator; on_done(result, error) runs on the Tk thread.
+
+        While it runs, edits are queued (see _apply_edit) and actions that
+        need the whole document are refused (see _busy). work may post
+        (label, fraction) to task_queue to show its progress; fraction None
+        keeps the bar indeterminate. With a cancel event, a Cancel button
+        sets it and work is expected to stop soon after.
+
+        The thread does not keep the window responsive through everything:
+        PyMuPDF holds the GIL inside a single call such as doc.save(), so
+        the Tk loop stalls for as long as MuPDF writes a file. What runs
+        between MuPDF calls (and compression's worker processes) does not.
+        """
+        self._saving = True
+        self._task_cancel = cancel
+        self.task_label.configure(text=message)
+        if cancel is not None:
+            self.task_cancel_btn.configure(state="normal")
+            self.task_cancel_btn.pack(side=tk.RIGHT, padx=(0, 10))
+        self.task_label.pack(side=tk.RIGHT, padx=(5, 10))
+        self.task_progress.configure(mode="indeterminate")
+        self.task_progress.pack(side=tk.RIGHT)
+        self.task_progress.start()
+        outcome = {}
+
+        def run():
+            try:
+                outcome['result'] = work()
+            except Exception as e:
+                outcome['error'] = e
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+
+        def poll():
+            if thread.is_alive():
+                self._show_task_progress()
+                self.after(100, poll)
                 return
+            self._saving = False
+            self._task_cancel = None
+            self._drain_task_queue()
+            self.task_progress.stop()
+            self.task_progress.pack_forget()
+            self.task_label.pack_forget()
+            self.task_cancel_btn.pack_forget()
+            on_done(outcome.get('result'), outcome.get('error'))
+            if self._saving:
+                return  # on_done started another task (Save As fallback); it takes over the queue
+            queued, self._queued_edits = self._queued_edits, []
+            for apply in queued:
+                apply()
+            if self._close_after_save:
+                self.on_close()
+        self.after(100, poll)
+
+    def _drain_task_queue(self):
+        """Latest (label, fraction) posted to task_queue, or None when nothing new arrived."""
+        latest = None
+        while True:
             try:
-                self.pdf_doc.save(path)
-                messagebox.showinfo("Saved", f"PDF saved to {path}")
-            except Exception as e2:
-                messagebox.showerror("Error", f"Failed to save PDF: {e2}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to save PDF: {e}")
+                latest = self.task_queue.get_nowait()
+            except queue.Empty:
+                return latest
+
+    def _show_task_progress(self):
+        update = self._drain_task_queue()
+        if update is None or (self._task_cancel is not None and self._task_cancel.is_set()):
+            return  # Keep "Cancelling..." up once asked
+        label, fraction = update
+        self.task_label.configure(text=label)
+        if fraction is None:
+            if self.task_progress.cget("mode") != "indeterminate":
+                self.task_progress.configure(mode="indeterminate")
+                self.task_progress.start()
+        else:
+            if self.task_progress.cget("mode") != "determinate":
+                self.task_progress.stop()
+                self.task_progress.configure(mode="determinate")
+            self.task_progress.set(fraction)
+
+    def _cancel_task(self):
+        if self._task_cancel is not None:
+            self._task_cancel.set()
+            self.task_cancel_btn.configure(state="disabled")
+            self.task_label.configure(text="Cancelling...")
+
+    def _busy(self):
+        """True (after telling the user) while a background save is running."""
+        if self._saving:
+            self.show_notification("Please wait for the running task to finish.")
+        return self._saving
+
+    def _apply_edit(self, apply):
+        """Run an edit now, or queue it until the running save has finished."""
+        if self._saving:
+            self._queued_edits.append(apply)
+            self.show_notification("The edit will be applied when the running task finishes.")
+            return
+        apply()
 
     def refresh_thumbnails(self):
-        # Clear previous thumbnails
-        for widget in self.thumbs_inner.winfo_children():
-            widget.destroy()
-        self.thumbnail_images.clear()
-        self.thumbnail_buttons = []
-        self.thumbnail_labels = []
-        
         # Cancel running thread
         if hasattr(self, '_thumb_thread_stop_event'):
             self._thumb_thread_stop_event.set()
         
+        # Track loaded thumbnails
+        self._loaded_thumbnails.clear()
+        self._thumb_pending = []
+        
         if not self.pdf_doc or not self.pdf_path:
+            self.thumb_strip.reset(0)
             return
         
-        # Track loaded thumbnails
-        self._loaded_thumbnails = set()
-        
-        thumb_width = 180
-        # Create placeholder frames for ALL pages
-        for i in range(len(self.pdf_doc)):
-            self.thumbnail_buttons.append(None)
-            self.thumbnail_labels.append(None)
-            self.thumbnail_images.append(None)
-            
-            # Placeholder frame
-            frame = tk.Frame(self.thumbs_inner, bg="#d0d0d0")
-            frame.grid(row=i, column=0, pady=2, padx=2, sticky="n")
-            
-            # Gray placeholder box
-            placeholder = tk.Label(frame, text="", bg="#e0e0e0", width=int(thumb_width/7), height=10, relief=tk.FLAT)
-            placeholder.pack(side=tk.TOP)
-            
-            # Page number
-            label = tk.Label(frame, text=f"{i+1}", font=("Arial", 10, "bold"), bg="#d0d0d0", fg="#666")
-            label.pack(side=tk.TOP, pady=(1,0))
-            
-            frame._page_index = i
-            frame._placeholder = placeholder
+        self.thumb_strip.reset(len(self.pdf_doc), self._thumb_slot_height())
+        self.thumb_strip.set_selected(self.selected_page)
         
         # Load initial window
         self._update_thumbnail_window(0)
 
+    def update_thumbnails(self, remap=None):
+        """Bring the strip up to date after an edit, rendering only new or changed pages.
+
+        remap(old) gives the index after the edit of the page at old, or None
+        for a page that is gone or changed (default: the session's record of
+        the latest edit). Loaded thumbnails move with their pages.
+        """
+        if not self.pdf_doc or not self.pdf_path:
+            self.refresh_thumbnails()
+            return
+        # Anything queued was rendered for the document before the edit
+        if hasattr(self, '_thumb_thread_stop_event'):
+            self._thumb_thread_stop_event.set()
+        self._loaded_thumbnails.clear()
+        self._thumb_pending = []
+        # Redraws the rows, which requests the pages in view that have no thumbnail
+        self.thumb_strip.remap(len(self.pdf_doc), remap or self.session.remap_index, self._thumb_slot_height())
+        self.thumb_strip.set_selected(self.selected_page)
+
+    def _thumb_slot_height(self):
+        # Slots are sized from the first page; other shapes are letterboxed
+        rect = self.pdf_doc[0].rect
+        return min(320, max(100, int(THUMB_WIDTH * rect.height / rect.width)))
+
+    def _on_thumb_view_change(self, first, last):
+        """Load thumbnails for the rows scrolled into view."""
+        if self.pdf_doc:
+            self._update_thumbnail_window((first + last) // 2, window_size=max(8, (last - first) // 2 + 2))
+
     def _update_thumbnail_window(self, center_page, window_size=8):
         """Load thumbnails for pages near center_page."""
         if not self.pdf_doc:
@@ -354,53 +747,49 @@ class PDFEditorApp(ctk.CTk if not DRAG_DROP_AVAILABLE else TkinterDnD.Tk):
         total_pages = len(self.pdf_doc)
         start = max(0, center_page - window_size)
         end = min(total_pages, center_page + window_size + 1)
-        
-        # Pages to load
-        pages_to_load = []
-        for i in range(start, end):
-            if i not in self._loaded_thumbnails:
-                pages_to_load.append(i)
-        
-        if not pages_to_load:
+        self._load_thumbnails(range(start, end))
+
+    def _load_thumbnails(self, pages):
+        """Render the thumbnails of pages not loaded or queued yet, replacing the previous request."""
+        def missing(i):
+            return i not in self._loaded_thumbnails and not self.thumb_strip.has_image(i)
+
+        if not any(missing(i) for i in pages):
             return
         
-        # Cancel previous thread
+        # Cancel previous thread; what it never delivered may be asked for again
         if hasattr(self, '_thumb_thread_stop_event'):
             self._thumb_thread_stop_event.set()
+        self._loaded_thumbnails.difference_update(self._thumb_pending)
         
+        # Pages to load
+        pages_to_load = [i for i in pages if missing(i)]
+        self._loaded_thumbnails.update(pages_to_load)
+        self._thumb_pending = pages_to_load
         self._thumb_thread_stop_event = threading.Event()
         threading.Thread(target=self._generate_thumbnails_background, 
-                         args=(self.pdf_path, pages_to_load, self._thumb_thread_stop_event), 
+                         args=(self.render_source, self.render_source.generation, pages_to_load,
+                               self._thumb_thread_stop_event), 
                          daemon=True).start()
 
-    def _generate_thumbnails_background(self, path, page_indices, stop_event):
+    def _generate_thumbnails_background(self, source, generation, page_indices, stop_event):
         try:
-            doc = fitz.open(path)
-            thumb_width = 180
+            thumb_width = THUMB_WIDTH
             
             for i in page_indices:
                 if stop_event.is_set():
                     break
                 
-                if i >= len(doc):
+                # Rendered from the live edited document; None once it has changed
+                img_resized = source.thumbnail(i, generation, thumb_width, self.thumb_cache)
+                if img_resized is None:
+                    if generation != source.generation:
+                        break
                     continue
-                    
-                page = doc[i]
-                pix = page.get_pixmap(matrix=fitz.Matrix(0.25, 0.25))
-                img_data = pix.tobytes("png")
-                
-                img = Image.open(io.BytesIO(img_data))
-                aspect = img.height / img.width
-                thumb_height = int(thumb_width * aspect)
-                img_resized = img.resize((thumb_width, thumb_height), Image.LANCZOS)
                 
                 # Push to queue instead of direct update
-                self.thumb_queue.put((i, img_resized, thumb_width, thumb_height))
-                
-                # Mark as loaded in background thread to avoid re-queueing
-                self._loaded_thumbnails.add(i)
+                self.thumb_queue.put((generation, i, img_resized, thumb_width, img_resized.height))
                     
-            doc.close()
             # Restore highlight after loading
             self.after(0, self._highlight_selected_thumbnail)
             
@@ -415,7 +804,10 @@ class PDFEditorApp(ctk.CTk if not DRAG_DROP_AVAILABLE else TkinterDnD.Tk):
                 try:
                     # Get item without blocking
                     item = self.thumb_queue.get_nowait()
-                    index, pil_img, w, h = item
+                    generation, index, pil_img, w, h = item
+                    # Drop thumbnails rendered before the latest edit
+                    if self.render_source is None or generation != self.render_source.generation:
+                        continue
                     self._add_single_thumbnail(index, pil_img, w, h)
                 except queue.Empty:
                     break
@@ -426,41 +818,12 @@ class PDFEditorApp(ctk.CTk if not DRAG_DROP_AVAILABLE else TkinterDnD.Tk):
             self.after(50, self._check_thumbnail_queue)
 
     def _add_single_thumbnail(self, index, pil_img, width, height):
-        if index >= len(self.thumbnail_buttons):
-            return
-            
-        tk_img = ImageTk.PhotoImage(pil_img)
-        self.thumbnail_images[index] = tk_img 
-        
-        frame = tk.Frame(self.thumbs_inner, bg="#f0f0f0")
-        frame.grid(row=index, column=0, pady=2, padx=2, sticky="n")
-        
-        btn = tk.Button(frame, image=tk_img, width=width, height=height, relief=tk.FLAT, bg="#f0f0f0", bd=2)
-        btn.pack(side=tk.TOP)
-        btn.bind('<ButtonPress-1>', partial(self._on_thumb_press, idx=index))
-        btn.bind('<ButtonRelease-1>', partial(self._on_thumb_release, idx=index))
-        
-        label = tk.Label(frame, text=f"{index+1}", font=("Arial", 10, "bold"), bg="#f0f0f0", fg="#222")
-        label.pack(side=tk.TOP, pady=(1,0))
-        
-        self.thumbnail_buttons[index] = btn
-        self.thumbnail_labels[index] = label
-        
-        if self.selected_page == index:
-            self._highlight_selected_thumbnail()
-
+        if index not in self._loaded_thumbnails:
+            return  # Discarded since it was queued
+        self.thumb_strip.set_image(index, pil_img)
 
     def _highlight_selected_thumbnail(self):
-        for idx, (btn, lbl) in enumerate(zip(self.thumbnail_buttons, self.thumbnail_labels)):
-            if btn is None or lbl is None:
-                continue
-                
-            if idx == self.selected_page:
-                btn.config(bg="#1976D2", activebackground="#1565C0", bd=3, highlightbackground="#1976D2")
-                lbl.config(bg="#1976D2", fg="white")
-            else:
-                btn.config(bg="#f0f0f0", activebackground="#e0e0e0", bd=2, highlightbackground="#f0f0f0")
-                lbl.config(bg="#f0f0f0", fg="#222")
+        self.thumb_strip.set_selected(self.selected_page)
 
     def _on_thumb_press(self, event, idx):
         self.drag_data['from_idx'] = idx
@@ -505,26 +868,12 @@ class PDFEditorApp(ctk.CTk if not DRAG_DROP_AVAILABLE else TkinterDnD.Tk):
             return
         # Map mouse position to scrolled content
         content_y = self.thumb_canvas.canvasy(mouse_y)
-        # Calculate the y-positions of the gaps between thumbnails
-        gap_positions = [0]
-        total = 0
-        for j, btn in enumerate(self.thumbnail_buttons):
-            # Skip if thumbnail not yet loaded
-            if btn is None or self.thumbnail_labels[j] is None:
-                continue
-                
-            h = btn.winfo_height() + self.thumbnail_labels[j].winfo_height() + 3  # 3 for padding
-            total += h
-            gap_positions.append(total)
+        # Gaps between thumbnails sit on row boundaries
+        row_h = self.thumb_strip.row_height
         # Find the closest gap to the mouse
-        min_dist = float('inf')
-        target_gap = None
-        for idx, gap_y in enumerate(gap_positions):
-            dist = abs(content_y - gap_y)
-            if dist < min_dist:
-                min_dist = dist
-                target_gap = idx
-                line_y = gap_y
+        target_gap = min(max(0, round(content_y / row_h)), self.thumb_strip.page_count)
+        line_y = target_gap * row_h
+        min_dist = abs(content_y - line_y)
         # Only show the highlight if the mouse is within 10px of a gap
         if min_dist <= 10:
             self.drag_data['target_idx'] = target_gap
@@ -554,54 +903,17 @@ class PDFEditorApp(ctk.CTk if not DRAG_DROP_AVAILABLE else TkinterDnD.Tk):
             to_idx = self.drag_data['target_idx'] if self.drag_data['target_idx'] is not None else idx
             from_idx = self.drag_data['from_idx']
             if from_idx is not None and to_idx is not None and from_idx != to_idx:
-                self._push_undo()
-                # Move the page
-                self.pdf_doc.move_page(from_idx, to_idx)
-                self.refresh_thumbnails()
-                # After move, the dragged page will be at:
-                # - to_idx-1 if from_idx < to_idx (dragging down)
-                # - to_idx if from_idx > to_idx (dragging up)
-                if from_idx < to_idx:
-                    new_idx = to_idx - 1
-                else:
-                    new_idx = to_idx
-                self.show_page(new_idx)
-                self.show_notification("Page reordered.")
+                def apply():
+                    # Move the page; the session returns where it ended up
+                    new_idx = self.session.move_page(from_idx, to_idx)
+                    self.update_thumbnails()
+                    self.show_page(new_idx)
+                    self.show_notification("Page reordered.")
+                self._apply_edit(apply)
         self.drag_data = {'from_idx': None, 'start_y': None, 'press_y': None, 'click_timer': None, 'moved': False, 'highlight_line': None, 'target_idx': None}
 
     def _ensure_thumbnail_visible(self, index):
-        if not self.thumbnail_buttons or index >= len(self.thumbnail_buttons):
-            return
-            
-        try:
-            btn = self.thumbnail_buttons[index]
-            row_frame = btn.master
-             
-            # Get coordinates relative to the scrolling frame (thumbs_inner)
-            y = row_frame.winfo_y()
-            h = row_frame.winfo_height()
-            
-            total_h = self.thumbs_inner.winfo_height()
-            canvas_h = self.thumb_canvas.winfo_height()
-            
-            if total_h <= canvas_h:
-                return # All content fits
-                
-            # Get visible range in canvas coordinates
-            top_visible = self.thumb_canvas.canvasy(0)
-            bottom_visible = self.thumb_canvas.canvasy(canvas_h)
-            
-            # Precision buffer
-            margin = 5
-            
-            # Check if out of view
-            if y < (top_visible + margin) or (y + h) > (bottom_visible - margin):
-                # Scroll to center the thumbnail
-                target_y = max(0, y - (canvas_h / 2) + (h / 2))
-                fraction = target_y / total_h
-                self.thumb_canvas.yview_moveto(fraction)
-        except Exception:
-            pass # Avoid errors during layout updates
+        self.thumb_strip.ensure_visible(index)
 
     def show_page(self, page_index):
         if not self.pdf_doc or page_index < 0 or page_index >= len(self.pdf_doc):
@@ -614,23 +926,198 @@ class PDFEditorApp(ctk.CTk if not DRAG_DROP_AVAILABLE else TkinterDnD.Tk):
             return
         # Hide drop label when PDF is loaded
         self.drop_label.place_forget()
+        # Prefetch in the direction the user is paging
+        direction = -1 if self.selected_page is not None and page_index < self.selected_page else 1
+        if page_index != self.selected_page:
+            # A new page starts out fitted to the window
+            self.preview_zoom = 1
+            self._zoom_origin = (0, 0)
+            self.preview_canvas.configure(cursor="")
         self.selected_page = page_index
         self._highlight_selected_thumbnail()
         self._ensure_thumbnail_visible(page_index)
         # Trigger lazy loading of nearby thumbnails
         if hasattr(self, '_update_thumbnail_window'):
             self._update_thumbnail_window(page_index)
-        page = self.pdf_doc[page_index]
-        # Render at high resolution, then scale down to fit canvas
-        pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))
-        pil_img = Image.open(io.BytesIO(pix.tobytes("png")))
-        self.current_pil_image = pil_img
-        self._display_pil_image_on_canvas(pil_img)
-        # Update page label
+        self._render_preview(page_index, direction)
+        self._update_page_label()
+
+    def _update_page_label(self):
         if hasattr(self, 'page_label') and self.pdf_doc:
-            self.page_label.configure(text=f"Page {self.selected_page+1} / {len(self.pdf_doc)}")
+            text = f"Page {self.selected_page+1} / {len(self.pdf_doc)}"
+            if self.preview_zoom > 1:
+                text += f"  ({self.preview_zoom:.0%})"
+            self.page_label.configure(text=text)
+
+    def _render_preview(self, page_index, direction=1, placeholder=True):
+        """Show the page rendered at exactly the canvas size, so no resample is needed.
+
+        Served from the preview cache when possible. Otherwise the page's
+        thumbnail is shown upscaled straight away (or a quick draft render
+        when there is none) and the full render replaces it from
+        _check_preview_queue when the background renderer is done. With
+        placeholder=False whatever is on screen stays until then.
+        """
+        canvas_width = self.preview_canvas.winfo_width()
+        canvas_height = self.preview_canvas.winfo_height()
+        if canvas_width < 10 or canvas_height < 10:
+            # Not laid out yet; the first <Configure> renders again at the real size
+            canvas_width, canvas_height = 800, 1000
+        self._wanted_preview = (page_index, canvas_width, canvas_height)
+        thumb = self.thumb_strip.source_image(page_index) if placeholder else None
+        pil_img = self.preview_renderer.request(page_index, canvas_width, canvas_height, direction,
+                                                draft=placeholder and thumb is None)
+        if pil_img is not None:
+            self.current_pil_image = pil_img
+        elif thumb is not None:
+            self.current_pil_image = thumb
+        if self.preview_zoom > 1:
+            self._draw_zoomed_view()
+        elif pil_img is not None:
+            self._display_pil_image_on_canvas(pil_img)
+        elif thumb is not None:
+            self._display_pil_image_on_canvas(thumb, Image.BILINEAR)
+
+    def _check_preview_queue(self):
+        """Show background preview renders that are still wanted."""
+        try:
+            while True:
+                (generation, *wanted), pil_img, final = self.preview_queue.get_nowait()
+                if (self.render_source and generation == self.render_source.generation
+                        and tuple(wanted) == self._wanted_preview):
+                    # Drafts are upscaled cheaply; the full render needs no resample
+                    self.current_pil_image = pil_img
+                    if self.preview_zoom > 1:
+                        self._schedule_zoom_redraw()  # A sharper backdrop behind missing tiles
+                    else:
+                        self._display_pil_image_on_canvas(pil_img, Image.LANCZOS if final else Image.BILINEAR)
+        except queue.Empty:
+            pass
+        try:
+            while True:
+                key, tile_img = self.tile_queue.get_nowait()
+                view = self._zoom_view
+                if self.preview_zoom > 1 and view and key[:3] == view[:3] and key[3:] in view[3]:
+                    photo = ImageTk.PhotoImage(tile_img)
+                    self._zoom_photos[key] = photo
+                    self._draw_tile(key[3:], photo)
+        except queue.Empty:
+            pass
+        finally:
+            self.after(15, self._check_preview_queue)
+
+    # Zoom and pan
+
+    def _zoom_geometry(self, zoom):
+        """(canvas w, canvas h, render scale, page w, page h, x offset, y offset) for a zoom level.
 
-    def _display_pil_image_on_canvas(self, pil_img):
+        Offsets centre the page on the canvas along an axis where it is smaller.
+        """
+        canvas_width = max(10, self.preview_canvas.winfo_width())
+        canvas_height = max(10, self.preview_canvas.winfo_height())
+        page_w, page_h = self.session.page_size(self.selected_page)
+        scale = round(min(canvas_width / page_w, canvas_height / page_h) * zoom, 4)
+        width, height = math.ceil(page_w * scale), math.ceil(page_h * scale)
+        return (canvas_width, canvas_height, scale, width, height,
+                max(0, (canvas_width - width) // 2), max(0, (canvas_height - height) // 2))
+
+    def _step_zoom(self, steps, anchor=None):
+        below = [z for z in ZOOM_LEVELS if z < self.preview_zoom]
+        above = [z for z in ZOOM_LEVELS if z > self.preview_zoom]
+        if steps > 0 and above:
+            self._set_zoom(above[0], anchor)
+        elif steps < 0 and below:
+            self._set_zoom(below[-1], anchor)
+
+    def _set_zoom(self, zoom, anchor=None):
+        """Zoom the preview, keeping the page point under anchor (canvas x, y; default centre) still."""
+        if not self.pdf_doc or self.selected_page is None or zoom == self.preview_zoom:
+            return
+        canvas_width, canvas_height, _, _, _, off_x, off_y = self._zoom_geometry(self.preview_zoom)
+        mx, my = anchor or (canvas_width / 2, canvas_height / 2)
+        ox, oy = self._zoom_origin
+        ratio = zoom / self.preview_zoom
+        _, _, _, _, _, new_off_x, new_off_y = self._zoom_geometry(zoom)
+        self._zoom_origin = (int((ox + mx - off_x) * ratio - mx + new_off_x),
+                             int((oy + my - off_y) * ratio - my + new_off_y))
+        self.preview_zoom = zoom
+        self.preview_canvas.configure(cursor="fleur" if zoom > 1 else "")
+        if zoom == 1:
+            self._zoom_origin = (0, 0)
+            self._zoom_view = None
+            self._zoom_photos = {}
+            self._render_preview(self.selected_page, placeholder=False)
+        else:
+            self._draw_zoomed_view()
+        self._update_page_label()
+
+    def _schedule_zoom_redraw(self):
+        if self._zoom_redraw_job is None:
+            self._zoom_redraw_job = self.after(RESIZE_FRAME_MS, self._draw_zoomed_view)
+
+    def _on_preview_press(self, event):
+        # The only <Button-1> handler of the canvas: a rebind would replace it
+        if not self.pdf_doc:
+            self._on_canvas_click(event)
+        elif self.preview_zoom > 1:
+            self._pan_start = (event.x, event.y) + self._zoom_origin
+
+    def _on_preview_drag(self, event):
+        if self._pan_start is None:
+            return
+        x, y, ox, oy = self._pan_start
+        self._zoom_origin = (ox - (event.x - x), oy - (event.y - y))
+        self._schedule_zoom_redraw()
+
+    def _draw_zoomed_view(self):
+        """Draw the visible tiles of the zoomed page and queue the missing ones.
+
+        Missing tiles show the fit-to-window preview, cropped and upscaled,
+        until the tile renderer delivers them.
+        """
+        self._zoom_redraw_job = None
+        if not self.pdf_doc or self.selected_page is None or self.preview_zoom == 1:
+            return
+        canvas_width, canvas_height, scale, width, height, off_x, off_y = self._zoom_geometry(self.preview_zoom)
+        ox = min(max(0, self._zoom_origin[0]), max(0, width - canvas_width))
+        oy = min(max(0, self._zoom_origin[1]), max(0, height - canvas_height))
+        self._zoom_origin = (ox, oy)
+        x1, y1 = min(ox + canvas_width, width), min(oy + canvas_height, height)
+        size = self.tile_renderer.tile_size
+        cols = range(ox // size, (x1 - 1) // size + 1)
+        rows = range(oy // size, (y1 - 1) // size + 1)
+        visible = [(tx, ty) for ty in rows for tx in cols]
+        # Centre tiles first, then a ring around the view so short pans are already rendered
+        cx, cy = (ox + x1) / 2 / size, (oy + y1) / 2 / size
+        visible.sort(key=lambda t: (t[0] + 0.5 - cx) ** 2 + (t[1] + 0.5 - cy) ** 2)
+        ring = [(tx, ty) for ty in range(max(0, rows[0] - 1), min(rows[-1] + 2, -(-height // size)))
+                for tx in range(max(0, cols[0] - 1), min(cols[-1] + 2, -(-width // size)))
+                if tx not in cols or ty not in rows]
+        found = self.tile_renderer.request(self.selected_page, scale, visible + ring)
+
+        self.preview_canvas.delete("all")
+        if self.current_pil_image is not None:
+            f = self.current_pil_image.width / width
+            backdrop = self.current_pil_image.resize((x1 - ox, y1 - oy), Image.BILINEAR,
+                                                     box=(ox * f, oy * f, x1 * f, y1 * f))
+            self._zoom_backdrop = ImageTk.PhotoImage(backdrop)
+            self.preview_canvas.create_image(off_x, off_y, anchor="nw", image=self._zoom_backdrop)
+        generation = self.render_source.generation
+        self._zoom_view = (generation, self.selected_page, scale, set(visible), off_x - ox, off_y - oy)
+        photos = {}
+        for tile in visible:
+            if tile in found:
+                key = (generation, self.selected_page, scale) + tile
+                photos[key] = self._zoom_photos.get(key) or ImageTk.PhotoImage(found[tile])
+                self._draw_tile(tile, photos[key])
+        self._zoom_photos = photos
+
+    def _draw_tile(self, tile, photo):
+        dx, dy = self._zoom_view[4:]
+        size = self.tile_renderer.tile_size
+        self.preview_canvas.create_image(tile[0] * size + dx, tile[1] * size + dy, anchor="nw", image=photo)
+
+    def _display_pil_image_on_canvas(self, pil_img, resample=Image.LANCZOS):
         canvas_width = self.preview_canvas.winfo_width()
         canvas_height = self.preview_canvas.winfo_height()
         if canvas_width < 10 or canvas_height < 10:
@@ -640,8 +1127,12 @@ class PDFEditorApp(ctk.CTk if not DRAG_DROP_AVAILABLE else TkinterDnD.Tk):
         scale = min(canvas_width / img_w, canvas_height / img_h)
         new_w = int(img_w * scale)
         new_h = int(img_h * scale)
-        resized_img = pil_img.resize((new_w, new_h), Image.LANCZOS)
-        tk_img = ImageTk.PhotoImage(resized_img)
+        if abs(new_w - img_w) > 1 or abs(new_h - img_h) > 1:
+            # Only images not rendered for this canvas size need resampling
+            pil_img = pil_img.resize((new_w, new_h), resample)
+        else:
+            new_w, new_h = img_w, img_h
+        tk_img = ImageTk.PhotoImage(pil_img)
         self.preview_canvas.delete("all")
         self.preview_canvas.image = tk_img
         self.preview_canvas.create_image((canvas_width - new_w)//2, (canvas_height - new_h)//2, anchor="nw", image=tk_img)
@@ -684,11 +1175,14 @@ class PDFEditorApp(ctk.CTk if not DRAG_DROP_AVAILABLE else TkinterDnD.Tk):
         if len(self.pdf_doc) == 1:
             messagebox.showwarning("Cannot Delete", "A PDF must have at least one page.")
             return
-        self._push_undo()
-        self.pdf_doc.delete_page(idx)
-        self.refresh_thumbnails()
-        self.show_page(min(idx, len(self.pdf_doc)-1))
-        self.show_notification("Page deleted.")
+        def apply():
+            if idx >= len(self.pdf_doc) or len(self.pdf_doc) == 1:
+                return  # Queued behind other edits that made it impossible
+            self.session.delete_page(idx)
+            self.update_thumbnails()
+            self.show_page(min(idx, len(self.pdf_doc)-1))
+            self.show_notification("Page deleted.")
+        self._apply_edit(apply)
 
     def delete_multiple_pages(self):
         if not self.pdf_doc:
@@ -710,28 +1204,24 @@ class PDFEditorApp(ctk.CTk if not DRAG_DROP_AVAILABLE else TkinterDnD.Tk):
                 messagebox.showwarning("Input Required", "Please enter page numbers or ranges.", parent=input_dialog)
                 return
             try:
-                pages_to_delete = set()
-                for part in raw.split(','):
-                    if '-' in part:
-                        start, end = part.split('-')
-                        start, end = int(start), int(end)
-                        if start > end:
-                            raise ValueError
-                        pages_to_delete.update(range(start, end+1))
-                    else:
-                        pages_to_delete.add(int(part))
-                # Convert to zero-based and sort descending for safe deletion
-                pages_to_delete = sorted([p-1 for p in pages_to_delete if 1 <= p <= len(self.pdf_doc)], reverse=True)
-                if not pages_to_delete:
-                    raise ValueError
-                for p in pages_to_delete:
-                    if 0 <= p < len(self.pdf_doc):
-                        self.pdf_doc.delete_page(p)
-                input_dialog.destroy()
-                self.refresh_thumbnails()
-                self.show_page(0)
+                pages_to_delete = parse_page_spec(raw, len(self.pdf_doc))
             except Exception:
                 messagebox.showerror("Error", "Invalid input. Use e.g. 1,7,8 or 5-9.", parent=input_dialog)
+                return
+            if len(pages_to_delete) == len(self.pdf_doc):
+                messagebox.showwarning("Cannot Delete", "A PDF must have at least one page.", parent=input_dialog)
+                return
+            input_dialog.destroy()
+            def apply():
+                pages = [p for p in pages_to_delete if p < len(self.pdf_doc)]
+                if not pages or len(pages) == len(self.pdf_doc):
+                    return  # Queued behind other edits that made it impossible
+                # One bulk, undoable step however many pages are selected
+                self.session.delete_pages(pages)
+                self.update_thumbnails()
+                self.show_page(min(pages[0], len(self.pdf_doc) - 1))
+                self._update_undo_redo_btn_state()
+            self._apply_edit(apply)
         delete_btn = tk.Button(input_dialog, text="Delete", command=on_delete, width=10)
         delete_btn.pack(pady=10)
         input_dialog.transient(self)
@@ -752,20 +1242,20 @@ class PDFEditorApp(ctk.CTk if not DRAG_DROP_AVAILABLE else TkinterDnD.Tk):
         if self.selected_page is None:
             return
         insert_at = self.selected_page if before else self.selected_page + 1
-        try:
-            self._push_undo()
-            ext_pdf = fitz.open(pdf_path)
-            for i in range(len(ext_pdf)):
-                self.pdf_doc.insert_pdf(ext_pdf, from_page=i, to_page=i, start_at=insert_at + i)
-            ext_pdf.close()
-            self.refresh_thumbnails()
-            self.show_page(insert_at)
-            self._update_undo_redo_btn_state()
-            self.show_notification("Page(s) inserted.")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to insert PDF pages: {e}")
+        def apply():
+            try:
+                self.session.insert_pdf(pdf_path, min(insert_at, len(self.pdf_doc)))
+                self.update_thumbnails()
+                self.show_page(min(insert_at, len(self.pdf_doc) - 1))
+                self._update_undo_redo_btn_state()
+                self.show_notification("Page(s) inserted.")
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to insert PDF pages: {e}")
+        self._apply_edit(apply)
 
     def merge_pdfs(self):
+        if self._busy():
+            return
         paths = list(filedialog.askopenfilenames(
             title="Select PDFs to Merge",
             filetypes=[("PDF Files", "*.pdf")],
@@ -844,24 +1334,23 @@ class PDFEditorApp(ctk.CTk if not DRAG_DROP_AVAILABLE else TkinterDnD.Tk):
             if len(paths) < 2:
                 self.show_notification("Select at least two PDFs to merge.")
                 return
-            import fitz, tempfile, uuid, os
-            merged_pdf = fitz.open()
-            try:
-                for pdf_path in paths:
-                    src = fitz.open(pdf_path)
-                    merged_pdf.insert_pdf(src)
-                    src.close()
-                # Save to a temp file and open in editor
-                temp_dir = tempfile.gettempdir()
-                temp_path = os.path.join(temp_dir, f"merged_{uuid.uuid4().hex}.pdf")
-                merged_pdf.save(temp_path)
-                self.show_notification("PDFs merged and loaded in editor!")
-                self.open_pdf(temp_path, is_merged=True)
-            except Exception as e:
-                self.show_notification(f"Merge failed: {e}")
-            finally:
-                merged_pdf.close()
+            import tempfile, uuid
+            # Merge into a temp file on a worker thread; the editor then reads it in place
+            temp_path = os.path.join(tempfile.gettempdir(), f"merged_{uuid.uuid4().hex}.pdf")
+            inputs = list(paths)
             dialog.destroy()
+            def on_done(result, error):
+                if error:
+                    # The open document stays; edits made meanwhile are applied to it
+                    self.show_notification(f"Merge failed: {error}")
+                    return
+                # Edits made meanwhile were for the document being replaced
+                self._queued_edits = []
+                self.open_pdf(temp_path, is_merged=True)
+                self.show_notification(f"Merged {result['files']} PDFs ({result['pages']} pages) "
+                                       f"in {result['seconds']:.1f}s and loaded in editor!")
+            self._run_background_task(lambda: merge_pdfs(inputs, temp_path), on_done,
+                                      f"Merging {len(inputs)} PDFs...")
         merge_btn = tk.Button(dialog, text="Merge Now", font=("Arial", 12, "bold"), command=do_merge, bg="#1976D2", fg="#fff", activebackground="#1565C0", activeforeground="#fff", relief=tk.FLAT)
         merge_btn.pack(pady=15)
         dialog.transient(self)
@@ -871,17 +1360,22 @@ class PDFEditorApp(ctk.CTk if not DRAG_DROP_AVAILABLE else TkinterDnD.Tk):
         if not self.pdf_doc or self.selected_page is None:
             self.show_notification("No page selected to rotate.")
             return
-        self._push_undo()
-        page = self.pdf_doc[self.selected_page]
-        page.set_rotation((page.rotation + 90) % 360)
-        self.refresh_thumbnails()
-        self.show_page(self.selected_page)
-        self.show_notification("Page rotated 90° clockwise.")
+        page = self.selected_page
+        def apply():
+            if page >= len(self.pdf_doc):
+                return
+            self.session.rotate_page(page, 90)
+            self.update_thumbnails()
+            self.show_page(page)
+            self.show_notification("Page rotated 90° clockwise.")
+        self._apply_edit(apply)
 
     def compress_pdf(self):
         if not self.pdf_doc or not self.pdf_path:
             messagebox.showwarning("No PDF", "Open a PDF first.")
             return
+        if self._busy():
+            return
         
         # Show compression options dialog
         dialog = tk.Toplevel(self)
@@ -936,6 +1430,14 @@ class PDFEditorApp(ctk.CTk if not DRAG_DROP_AVAILABLE else TkinterDnD.Tk):
         if not result['process']:
             return
             
+        target_mb = None
+        if result['method'] == 'target':
+            try:
+                target_mb = float(result['target'])
+            except ValueError:
+                messagebox.showerror("Error", "Invalid target size.")
+                return
+
         # Get output path
         output_path = filedialog.asksaveasfilename(
             defaultextension=".pdf",
@@ -944,172 +1446,55 @@ class PDFEditorApp(ctk.CTk if not DRAG_DROP_AVAILABLE else TkinterDnD.Tk):
         )
         if not output_path:
             return
-            
-        # Progress UI
-        progress_win = tk.Toplevel(self)
-        progress_win.title("Processing")
-        progress_win.geometry("300x100")
-        progress_win.transient(self)
-        progress_win.grab_set()
-        tk.Label(progress_win, text="Compressing PDF...", font=("Arial", 12)).pack(expand=True)
-        progress_win.update()
-        
-        try:
-            target_mb = None
-            if result['method'] == 'target':
-                try:
-                    target_mb = float(result['target'])
-                except ValueError:
-                    messagebox.showerror("Error", "Invalid target size.")
-                    progress_win.destroy()
-                    return
 
-            # Perform compression
-            final_size = self._compress_pdf_logic(output_path, result['quality'], target_mb)
-            
-            progress_win.destroy()
-            
+        # Runs on the worker thread: hand progress to the UI through task_queue
+        def report(stage, done, total):
+            if stage == 'images':
+                self.task_queue.put((f"Compressing images {done}/{total}...", done / total))
+            elif stage == 'search':
+                self.task_queue.put((f"Choosing settings ({done} samples)...", None))
+            else:
+                self.task_queue.put((f"Writing pass {done}...", None))
+
+        def on_done(compress_result, error):
+            if isinstance(error, CompressionCancelled):
+                self.show_notification("Compression cancelled.")
+                return
+            if error:
+                messagebox.showerror("Error", f"Compression failed: {error}")
+                return
+            if self._close_after_save:
+                return  # Finished before the cancel reached it; the window is closing
+
             # Show result
+            final_size = compress_result['size']
             size_msg = f"Final Size: {final_size/1024/1024:.2f} MB"
+            if target_mb and compress_result['dpi']:
+                size_msg += f"\nImages: {compress_result['dpi']} DPI, JPEG quality {compress_result['quality']}"
             if target_mb and final_size > target_mb * 1024 * 1024:
                 size_msg += f"\n(Could not reach target {target_mb} MB)"
-            
+
             messagebox.showinfo("Success", f"Compression Complete!\n{size_msg}")
-            
+
             # Ask to open
             if messagebox.askyesno("Open", "Open compressed file?"):
+                self._queued_edits = []  # They belong to the document being replaced
                 self.open_pdf(output_path)
-                
-        except Exception as e:
-            progress_win.destroy()
-            messagebox.showerror("Error", f"Compression failed: {e}")
-
-    def _compress_pdf_logic(self, output_path, quality_preset, target_mb=None):
-        import fitz
-        
-        # Levels: (DPI, JPEG Quality)
-        presets = {
-            'high': (150, 85),
-            'medium': (96, 70),
-            'low': (72, 50)
-        }
-        
-        # If target size is set, we iterate starting from medium
-        if target_mb:
-            target_bytes = target_mb * 1024 * 1024
-            original_size = os.path.getsize(self.pdf_path)
-            
-            if original_size <= target_bytes:
-                # Just deflate and save
-                self.pdf_doc.save(output_path, garbage=4, deflate=True)
-                return os.path.getsize(output_path)
-                
-            # Try progressively aggressive compression
-            attempts = [
-                (150, 75), # Attempt 1
-                (96, 60),  # Attempt 2
-                (72, 40),  # Attempt 3
-                (50, 30)   # Attempt 4 (Desperate)
-            ]
-            
-            for i, (dpi, jpg_q) in enumerate(attempts):
-                # We need to work on a copy to avoid messing up the current open doc interface
-                # or just process images and undo? Safer to open a fresh handle or copy.
-                # Since self.pdf_doc is open, let's save to a temp path then process.
-                
-                # For simplicity in this app structure, we will save to output_path and check size
-                # To do that we need to iterate images.
-                
-                # Optimized approach: use `cpdf` or `ghostscript` is better but we promised pure python/pymupdf
-                # PyMuPDF doesn't have a simple "save with global downsample" flag yet.
-                # We must iterate pages and images.
-                
-                # Make a temporary copy of the doc for processing
-                temp_doc = fitz.open(self.pdf_path)
-                self._downsample_images(temp_doc, dpi, jpg_q)
-                temp_doc.save(output_path, garbage=4, deflate=True)
-                temp_doc.close()
-                
-                current_size = os.path.getsize(output_path)
-                if current_size <= target_bytes:
-                    return current_size
-            
-            return os.path.getsize(output_path) # Return best effort
-            
-        else:
-            # Preset mode
-            dpi, jpg_q = presets.get(quality_preset, (96, 75))
-            temp_doc = fitz.open(self.pdf_path)
-            self._downsample_images(temp_doc, dpi, jpg_q)
-            temp_doc.save(output_path, garbage=4, deflate=True)
-            temp_doc.close()
-            return os.path.getsize(output_path)
-
-    def _downsample_images(self, doc, target_dpi, jpeg_quality):
-        import fitz
-        
-        xrefs = set()
-        for page in doc:
-            for img in page.get_images():
-                xref = img[0]
-                if xref in xrefs:
-                    continue
-                xrefs.add(xref)
-                
-                # Determine if image needs downsampling
-                # We can't easily get DPI, but we can get dimensions
-                # A heuristic: check image width/height vs page width/height is complex without location.
-                # Simple heuristic: if width > 2000, likely high res.
-                
-                # Actually, PyMuPDF allows updating the image stream.
-                try:
-                    pix = fitz.Pixmap(doc, xref)
-                    
-                    # Skip small images (icons, logos)
-                    if pix.width < 100 or pix.height < 100:
-                        continue
-                        
-                    # Calculate scaling
-                    # This is rough because we don't know the physical size of the image on the page
-                    # But for general compression, reducing pixel count is key.
-                    # We'll limit max dimension.
-                    
-                    # Assuming 8.27 inch width (A4) * target_dpi
-                    max_dim = int(8.27 * target_dpi * 1.5) # *1.5 Slack
-                    
-                    if pix.width > max_dim or pix.height > max_dim:
-                        # Downscale
-                        scale = min(max_dim/pix.width, max_dim/pix.height)
-                        new_w = int(pix.width * scale)
-                        new_h = int(pix.height * scale)
-                        
-                        # fitz.Pixmap(colorspace, rect, alpha) - resizing needs care
-                        # Easiest: use PIL
-                        img_data = pix.tobytes()
-                        from PIL import Image
-                        import io
-                        
-                        with Image.open(io.BytesIO(img_data)) as pil_img:
-                            pil_img = pil_img.resize((new_w, new_h), Image.LANCZOS)
-                            
-                            # Convert back to bytes (JPEG)
-                            out_buffer = io.BytesIO()
-                            pil_img = pil_img.convert("RGB") # Ensure no alpha for JPEG
-                            pil_img.save(out_buffer, format="JPEG", quality=jpeg_quality, optimize=True)
-                            new_data = out_buffer.getvalue()
-                            
-                            doc.update_stream(xref, new_data)
-                except Exception:
-                    pass # Skip errors on individual images
-                
-
-
 
+        # The editor stays usable while images are encoded (it pauses while
+        # MuPDF writes the output); edits are applied once it is done
+        cancel = threading.Event()
+        self._run_background_task(
+            lambda: self.session.compress(output_path, result['quality'], target_mb, search=True,
+                                          progress=report, cancel=cancel),
+            on_done, "Compressing PDF...", cancel=cancel)
 
     def convert_page(self):
         if not self.pdf_doc or self.selected_page is None:
             messagebox.showwarning("No Page Selected", "Select a PDF page to convert.")
             return
+        if self._busy():
+            return
         # Prompt for format
         dialog = tk.Toplevel(self)
         dialog.title("Convert Page")
@@ -1142,46 +1527,26 @@ class PDFEditorApp(ctk.CTk if not DRAG_DROP_AVAILABLE else TkinterDnD.Tk):
         if not path:
             return
         try:
-            page = self.pdf_doc[self.selected_page]
-            pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))
-            img = Image.open(io.BytesIO(pix.tobytes("png")))
-            if fmt in ("PNG", "JPG"):
-                # Save as image
-                save_fmt = "JPEG" if fmt == "JPG" else fmt
-                img.save(path, save_fmt)
-                self.show_notification(f"Page saved as {fmt}.")
-            elif fmt == "DOCX":
-                try:
-                    from docx import Document
-                    from docx.shared import Inches
-                except ImportError:
-                    messagebox.showerror("Missing Dependency", "Please install python-docx to export as DOCX.")
-                    return
-                doc = Document()
-                # Save image to temp file
-                import tempfile
-                with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmp_img:
-                    img.save(tmp_img.name, "PNG")
-                    doc.add_picture(tmp_img.name, width=Inches(6))
-                doc.save(path)
+            self.session.export_page(self.selected_page, path, fmt)
+            if fmt == "DOCX":
                 self.show_notification("Page saved as DOCX (image in Word doc).")
             else:
-                messagebox.showerror("Error", "Unsupported format.")
+                self.show_notification(f"Page saved as {fmt}.")
+        except ImportError:
+            messagebox.showerror("Missing Dependency", "Please install python-docx to export as DOCX.")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to convert page: {e}")
 
     def on_close(self):
-        # Clean up temp file if it exists
-        if self.pdf_doc:
-            try:
-                self.pdf_doc.close()
-            except Exception:
-                pass
-        if self.pdf_temp_path and os.path.exists(self.pdf_temp_path):
-            try:
-                os.remove(self.pdf_temp_path)
-            except Exception:
-                pass
+        if self._saving:
+            # Never cut a save short; close as soon as it is done. A
+            # cancellable task (compression) is stopped first instead.
+            self._close_after_save = True
+            self._cancel_task()
+            self.show_notification("Closing after the running task stops...")
+            return
+        # Close the document and clean up its temp file
+        self._close_session()
         self.destroy()
 
     def _on_arrow_key(self, event):
@@ -1194,44 +1559,31 @@ class PDFEditorApp(ctk.CTk if not DRAG_DROP_AVAILABLE else TkinterDnD.Tk):
             if self.selected_page > 0:
                 self.show_page(self.selected_page - 1)
 
-    def _push_undo(self):
-        if self.pdf_doc:
-            try:
-                self.undo_stack.append(self.pdf_doc.write())
-                if len(self.undo_stack) > 10:
-                    self.undo_stack.pop(0)
-                self.redo_stack.clear()
-                self._update_undo_redo_btn_state()
-            except Exception:
-                pass
-
     def undo(self):
-        if not self.undo_stack:
+        if not self.session or not self.session.can_undo:
+            return
+        if self._saving:
+            self._apply_edit(self.undo)
             return
         try:
-            self.redo_stack.append(self.pdf_doc.write())
-            if len(self.redo_stack) > 10:
-                self.redo_stack.pop(0)
-            prev_state = self.undo_stack.pop()
-            self.pdf_doc = fitz.open(stream=prev_state, filetype='pdf')
-            self.refresh_thumbnails()
-            self.show_page(0)
+            page = self.session.undo()
+            self.update_thumbnails()
+            self.show_page(min(page, len(self.pdf_doc) - 1))
             self._update_undo_redo_btn_state()
             self.show_notification("Undo.")
         except Exception:
             messagebox.showerror("Undo Error", "Failed to undo.")
 
     def redo(self):
-        if not self.redo_stack:
+        if not self.session or not self.session.can_redo:
+            return
+        if self._saving:
+            self._apply_edit(self.redo)
             return
         try:
-            self.undo_stack.append(self.pdf_doc.write())
-            if len(self.undo_stack) > 10:
-                self.undo_stack.pop(0)
-            next_state = self.redo_stack.pop()
-            self.pdf_doc = fitz.open(stream=next_state, filetype='pdf')
-            self.refresh_thumbnails()
-            self.show_page(0)
+            page = self.session.redo()
+            self.update_thumbnails()
+            self.show_page(min(page, len(self.pdf_doc) - 1))
             self._update_undo_redo_btn_state()
             self.show_notification("Redo.")
         except Exception:
@@ -1322,8 +1674,7 @@ class PDFEditorApp(ctk.CTk if not DRAG_DROP_AVAILABLE else TkinterDnD.Tk):
             self.drop_label.bind('<Enter>', self._on_drop_zone_enter)
             self.drop_label.bind('<Leave>', self._on_drop_zone_leave)
             
-            # Also bind to the canvas for larger click area
-            self.preview_canvas.bind('<Button-1>', self._on_canvas_click)
+            # Clicks on the canvas itself (a larger area) are handled by _on_preview_press
         else:
             # Fallback for when tkinterdnd2 is not available
             self.drop_label = tk.Label(self.preview_canvas, 
@@ -1339,8 +1690,7 @@ class PDFEditorApp(ctk.CTk if not DRAG_DROP_AVAILABLE else TkinterDnD.Tk):
             self.drop_label.bind('<Enter>', self._on_drop_zone_enter)
             self.drop_label.bind('<Leave>', self._on_drop_zone_leave)
             
-            # Also bind to the canvas for larger click area
-            self.preview_canvas.bind('<Button-1>', self._on_canvas_click)
+            # Clicks on the canvas itself (a larger area) are handled by _on_preview_press
 
     def _on_drop_pdf(self, event):
         """Handle PDF file drop events"""
@@ -1444,5 +1794,7 @@ class PDFEditorApp(ctk.CTk if not DRAG_DROP_AVAILABLE else TkinterDnD.Tk):
 
 
 if __name__ == "__main__":
+    # Needed for the compression process pool in PyInstaller builds
+    multiprocessing.freeze_support()
     app = PDFEditorApp()
     app.mainloop() 
\ No newline at end of file
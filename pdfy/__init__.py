@@ -0,0 +1,18 @@
+"""PDFY document engine: PDF editing, compression and merging without a GUI.
+
+The Tk editor in pdf_editor.py and the ``python -m pdfy`` batch CLI are both
+thin front ends over this package.
+"""
+from .compress import COMPRESSION_PRESETS, CompressionCancelled, compress_pdf
+from .engine import DocumentSession
+from .merge import merge_pdfs
+from .pages import parse_page_spec
+
+__all__ = [
+    "COMPRESSION_PRESETS",
+    "CompressionCancelled",
+    "DocumentSession",
+    "compress_pdf",
+    "merge_pdfs",
+    "parse_page_spec",
+]
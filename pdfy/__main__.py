@@ -0,0 +1,7 @@
+import sys
+
+from .cli import main
+
+# Guarded so process-pool workers re-importing this module don't rerun the CLI
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""Micro-benchmarks for the engine: ``python -m pdfy.bench <name> ...``.
+
+Examples::
+
+    python -m pdfy.bench render doc.pdf
+    python -m pdfy.bench render doc.pdf --zooms 2 0.25 --repeat 5
+    python -m pdfy.bench displaylist drawing.pdf
+    python -m pdfy.bench pages --pages 5000 --spec 2-4999
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+from .engine import DocumentSession
+from .pages import parse_page_spec
+from .render import DisplayListCache, pixmap_to_image, render_page, render_thumbnail
+
+
+def _time_per_page(doc, func, repeat):
+    """Median seconds per page of func(page) over repeat sweeps of the document."""
+    sweeps = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for page in doc:
+            func(page)
+        sweeps.append((time.perf_counter() - start) / len(doc))
+    return statistics.median(sweeps)
+
+
+def bench_render(args):
+    """Pixmap -> PIL conversion: PNG round trip versus sharing the samples buffer."""
+    doc = fitz.open(args.pdf)
+    try:
+        for zoom in args.zooms:
+            matrix = fitz.Matrix(zoom, zoom)
+
+            def via_png(page):
+                pix = page.get_pixmap(matrix=matrix)
+                Image.open(io.BytesIO(pix.tobytes("png"))).load()
+
+            def via_buffer(page):
+                pixmap_to_image(page.get_pixmap(matrix=matrix)).load()
+
+            def raster_only(page):
+                page.get_pixmap(matrix=matrix)
+
+            raster = _time_per_page(doc, raster_only, args.repeat)
+            png = _time_per_page(doc, via_png, args.repeat)
+            buffer = _time_per_page(doc, via_buffer, args.repeat)
+            print(f"zoom {zoom:g}: raster {raster*1000:.1f} ms/page, "
+                  f"png round trip {png*1000:.1f} ms/page, frombuffer {buffer*1000:.1f} ms/page "
+                  f"({png/buffer:.1f}x faster, conversion overhead "
+                  f"{(png-raster)*1000:.1f} -> {(buffer-raster)*1000:.1f} ms)")
+    finally:
+        doc.close()
+
+
+def bench_displaylist(args):
+    """Rendering each page at several scales, re-interpreting it every time versus from a cached DisplayList."""
+    doc = fitz.open(args.pdf)
+    try:
+        def renders(source):
+            render_thumbnail(source)
+            for zoom in args.zooms:
+                render_page(source, zoom)
+
+        direct = _time_per_page(doc, renders, args.repeat)
+        cache = DisplayListCache(max_pages=len(doc))
+        cached = _time_per_page(doc, lambda page: renders(cache.get(doc, page.number, 0)), args.repeat)
+        print(f"thumbnail + zooms {' '.join(f'{z:g}' for z in args.zooms)}: "
+              f"direct {direct*1000:.1f} ms/page, display list cache {cached*1000:.1f} ms/page "
+              f"({direct/cached:.1f}x), {cache.stats()}")
+    finally:
+        doc.close()
+
+
+def _synthetic_pdf(page_count):
+    """In-memory PDF of page_count small text pages, as bytes."""
+    doc = fitz.open()
+    for i in range(page_count):
+        doc.new_page().insert_text((72, 72), f"Page {i + 1}")
+    try:
+        return doc.tobytes()
+    finally:
+        doc.close()
+
+
+def _timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def bench_pages(args):
+    """Deleting and extracting a page range: one MuPDF call per page versus the bulk session path."""
+    data = fitz.open(args.pdf).tobytes() if args.pdf else _synthetic_pdf(args.pages)
+    page_count = len(fitz.open(stream=data, filetype="pdf"))
+    pages = parse_page_spec(args.spec or f"2-{page_count - 1}", page_count)
+    print(f"{page_count} pages, selecting {len(pages)}")
+
+    doc = fitz.open(stream=data, filetype="pdf")
+    loop_delete = _timed(lambda: [doc.delete_page(p) for p in reversed(pages)])
+    doc.close()
+    session = DocumentSession(fitz.open(stream=data, filetype="pdf"))
+    bulk_delete = _timed(lambda: session.delete_pages(pages))
+    remaining = len(session)
+    undo = _timed(session.undo)
+    print(f"delete: per page {loop_delete:.3f} s, bulk {bulk_delete:.3f} s with undo capture "
+          f"({loop_delete/bulk_delete:.0f}x), {remaining} pages left, undo {undo:.3f} s "
+          f"restores {len(session)}")
+
+    def loop_extract():
+        subset = fitz.open()
+        for p in pages:
+            subset.insert_pdf(session.doc, from_page=p, to_page=p)
+        subset.tobytes()
+
+    loop_save = _timed(loop_extract)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        bulk_save = _timed(lambda: session.save(os.path.join(temp_dir, "subset.pdf"), pages))
+    print(f"extract: per page {loop_save:.3f} s, bulk {bulk_save:.3f} s ({loop_save/bulk_save:.1f}x)")
+    session.close()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="pdfy.bench", description="PDFY engine micro-benchmarks.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("render", help="Page render to PIL image latency")
+    p.add_argument("pdf")
+    p.add_argument("--zooms", type=float, nargs="+", default=[2.0, 0.25])
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(func=bench_render)
+
+    p = sub.add_parser("displaylist", help="Repeated renders of a page with and without a cached DisplayList")
+    p.add_argument("pdf")
+    p.add_argument("--zooms", type=float, nargs="+", default=[1.0, 2.0, 4.0])
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(func=bench_displaylist)
+
+    p = sub.add_parser("pages", help="Bulk delete and extract of a page range")
+    p.add_argument("pdf", nargs="?", help="Document to use instead of a synthetic one")
+    p.add_argument("--pages", type=int, default=5000, help="Size of the synthetic document")
+    p.add_argument("--spec", help="Pages to select, 1-based (default: all but the first and last)")
+    p.set_defaults(func=bench_pages)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""Batch command line front end: ``python -m pdfy <command> ...``.
+
+Examples::
+
+    python -m pdfy compress --preset medium in/*.pdf -o out/
+    python -m pdfy compress --target-mb 2 scan.pdf -o scan_small.pdf
+    python -m pdfy merge a.pdf b.pdf c.pdf -o merged.pdf
+    python -m pdfy delete --pages 1,3-4 in/*.pdf -o out/
+    python -m pdfy rotate --pages 2 --angle 180 doc.pdf -o out/
+    python -m pdfy extract --pages 1-5 doc.pdf -o first_five.pdf
+    python -m pdfy convert --page 1 --format png doc.pdf -o out/
+"""
+import argparse
+import glob
+import os
+import sys
+
+from .compress import COMPRESSION_PRESETS
+from .engine import DocumentSession, EXPORT_FORMATS
+from .merge import merge_pdfs
+from .pages import parse_page_spec
+
+
+def _expand_inputs(patterns):
+    # Shells on Windows do not expand wildcards, so do it here as well
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern))
+        paths.extend(matches if matches else [pattern])
+    return paths
+
+
+def _output_path(output, input_path, multiple, prefix="", ext=None):
+    """Resolve -o for one input: a directory (or several inputs) gets a per-file name."""
+    name = os.path.basename(input_path)
+    if ext:
+        name = os.path.splitext(name)[0] + ext
+    if output is None:
+        return os.path.join(os.path.dirname(input_path), prefix + name)
+    if multiple or os.path.isdir(output) or output.endswith(("/", os.sep)):
+        os.makedirs(output, exist_ok=True)
+        return os.path.join(output, name)
+    parent = os.path.dirname(output)
+    if parent:
+        os.makedirs(parent, exist_ok=True)
+    return output
+
+
+def _run_compress(session, args, out_path):
+    result = session.compress(out_path, args.preset, args.target_mb, workers=args.workers or None,
+                              search=args.search, placement=not args.no_placement)
+    final_size = result['size']
+    size_msg = f"{final_size/1024/1024:.2f} MB"
+    if args.target_mb and final_size > args.target_mb * 1024 * 1024:
+        size_msg += f" (could not reach target {args.target_mb} MB)"
+    if result['dpi']:
+        size_msg += f" at {result['dpi']} dpi / quality {result['quality']}"
+    if result['trial_encodes']:
+        size_msg += f" after {result['trial_encodes']} trial encodes"
+    if result['images']:
+        size_msg += (f", {result['images']} image(s) on {result['workers']} worker(s),"
+                     f" {result['speedup']:.1f}x speedup")
+    if result['kept'] or result['passthrough']:
+        size_msg += f", {result['kept'] + result['passthrough']} image(s) left as they were"
+    return size_msg
+
+
+def _run_delete(session, args, out_path):
+    pages = parse_page_spec(args.pages, len(session))
+    if len(pages) == len(session):
+        raise ValueError("A PDF must have at least one page.")
+    session.delete_pages(pages)
+    session.save(out_path)
+    return f"deleted {len(pages)} page(s)"
+
+
+def _run_rotate(session, args, out_path):
+    pages = parse_page_spec(args.pages, len(session)) if args.pages else range(len(session))
+    for p in pages:
+        session.rotate_page(p, args.angle)
+    session.save(out_path)
+    return f"rotated {len(pages)} page(s)"
+
+
+def _run_extract(session, args, out_path):
+    pages = parse_page_spec(args.pages, len(session))
+    session.save(out_path, pages)
+    return f"extracted {len(pages)} page(s)"
+
+
+def _run_convert(session, args, out_path):
+    if not 1 <= args.page <= len(session):
+        raise ValueError(f"Page must be 1 to {len(session)}")
+    session.export_page(args.page - 1, out_path, args.format)
+    return f"page {args.page} as {args.format}"
+
+
+# command -> (handler, prefix for default output names)
+_FILE_COMMANDS = {
+    'compress': (_run_compress, "compressed_"),
+    'delete': (_run_delete, "edited_"),
+    'rotate': (_run_rotate, "edited_"),
+    'extract': (_run_extract, "extracted_"),
+    'convert': (_run_convert, ""),
+}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="pdfy", description="PDFY batch PDF processing (no GUI).")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_io(p, output_help="Output file, or directory for several inputs (default: next to each input)"):
+        p.add_argument("inputs", nargs="+", help="Input PDF files or glob patterns")
+        p.add_argument("-o", "--output", help=output_help)
+
+    p = sub.add_parser("compress", help="Recompress images to shrink files")
+    add_io(p)
+    p.add_argument("--preset", choices=sorted(COMPRESSION_PRESETS), default="medium")
+    p.add_argument("--target-mb", type=float, help="Aim for this output size instead of a preset")
+    p.add_argument("--workers", type=int, default=0,
+                   help="Image recompression processes (default: one per CPU, 1 = serial)")
+    p.add_argument("--search", action="store_true",
+                   help="With --target-mb, search DPI/quality for the largest output under the target")
+    p.add_argument("--no-placement", action="store_true",
+                   help="Size images as if each spanned an A4 width instead of measuring their placement")
+
+    p = sub.add_parser("merge", help="Merge inputs, in order, into one PDF")
+    p.add_argument("inputs", nargs="+", help="Input PDF files or glob patterns")
+    p.add_argument("-o", "--output", required=True, help="Merged output file")
+    p.add_argument("--no-dedupe", action="store_true",
+                   help="Keep a separate copy of images and fonts repeated across inputs")
+
+    p = sub.add_parser("delete", help="Delete pages")
+    add_io(p)
+    p.add_argument("--pages", required=True, help="Pages to delete, e.g. 1,7,8 or 5-9")
+
+    p = sub.add_parser("rotate", help="Rotate pages clockwise")
+    add_io(p)
+    p.add_argument("--pages", help="Pages to rotate (default: all)")
+    p.add_argument("--angle", type=int, choices=(90, 180, 270), default=90)
+
+    p = sub.add_parser("extract", help="Save a subset of pages")
+    add_io(p)
+    p.add_argument("--pages", required=True, help="Pages to keep, e.g. 1,3,5-7")
+
+    p = sub.add_parser("convert", help="Export a page as an image or Word document")
+    add_io(p)
+    p.add_argument("--page", type=int, default=1, help="1-based page number (default: 1)")
+    p.add_argument("--format", type=str.upper, choices=EXPORT_FORMATS, default="PNG")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    inputs = _expand_inputs(args.inputs)
+
+    if args.command == "merge":
+        if len(inputs) < 2:
+            print("Select at least two PDFs to merge.", file=sys.stderr)
+            return 2
+        try:
+            result = merge_pdfs(inputs, args.output, dedupe=not args.no_dedupe)
+        except Exception as e:
+            print(f"Merge failed: {e}", file=sys.stderr)
+            return 1
+        growth = result['memory_growth']
+        memory = f", memory +{growth / (1024 * 1024):.0f}MB" if growth is not None else ""
+        print(f"{args.output}: merged {result['files']} files, {result['pages']} pages, "
+              f"{result['size'] / (1024 * 1024):.2f}MB in {result['seconds']:.1f}s{memory}")
+        if result['duplicates']:
+            print(f"  {result['duplicates']} repeated image/font stream(s) stored once, "
+                  f"{result['bytes_saved'] / (1024 * 1024):.2f}MB saved")
+        return 0
+
+    handler, prefix = _FILE_COMMANDS[args.command]
+    ext = "." + ("jpg" if args.format == "JPG" else args.format.lower()) if args.command == "convert" else None
+    failures = 0
+    for path in inputs:
+        out_path = _output_path(args.output, path, len(inputs) > 1, prefix, ext)
+        session = None
+        try:
+            session = DocumentSession.open(path, undo_limit=0)
+            print(f"{path} -> {out_path}: {handler(session, args, out_path)}")
+        except Exception as e:
+            failures += 1
+            print(f"{path}: failed: {e}", file=sys.stderr)
+        finally:
+            if session:
+                session.close()
+    return 1 if failures else 0
@@ -0,0 +1,638 @@
+"""Image-recompression based PDF size reduction.
+
+Images are resampled to a target DPI measured against the size they are
+actually shown at on the page (the largest placement when an image is
+used several times), so only images with more pixels than that size
+needs are touched. Images whose placement cannot be found fall back to
+assuming a full A4 width. A re-encoded image only replaces the original
+stream when it is smaller, and JPEGs that are already at or below the
+target quality and would barely shrink are left alone without decoding.
+
+Long runs can report progress and be cancelled: compress_pdf() calls
+progress(stage, done, total) as images are encoded ('images'), sample
+encodes are measured ('search', total None) and full document passes are
+written ('pass', total None), and checks a cancel event (anything with
+is_set(), e.g. threading.Event) between images and before every pass.
+With a process pool, images are reported in the order they finish and
+cancel is also checked every CANCEL_POLL_SECONDS while they run.
+"""
+import io
+import math
+import os
+import time
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+from .files import remove_file
+
+# Levels: (DPI, JPEG Quality)
+COMPRESSION_PRESETS = {
+    'high': (150, 85),
+    'medium': (96, 70),
+    'low': (72, 50)
+}
+
+# Progressively aggressive settings tried in target-size mode
+TARGET_ATTEMPTS = [
+    (150, 75),  # Attempt 1
+    (96, 60),   # Attempt 2
+    (72, 40),   # Attempt 3
+    (50, 30)    # Attempt 4 (Desperate)
+]
+
+# Search space for target-size mode with search=True
+SEARCH_DPIS = (300, 200, 150, 120, 96, 72, 50)
+SEARCH_QUALITIES = tuple(range(25, 91, 5))
+SEARCH_DPI_QUALITY = 50  # Quality floor while choosing the DPI, so resolution isn't bought with artefacts
+SEARCH_SAMPLE_IMAGES = 8
+SEARCH_REFINEMENTS = 2
+
+# A JPEG at or below the target quality is only re-encoded when resampling
+# takes each side below this fraction of its size
+PASSTHROUGH_SCALE = 0.9
+
+# How every full document pass is written
+_PASS_OPTIONS = dict(garbage=4, deflate=True)
+
+# Longest a pooled run goes without looking at its cancel event
+CANCEL_POLL_SECONDS = 0.2
+
+# IJG base luminance quantization table, for estimating a JPEG's quality
+_IJG_LUMINANCE = (16, 11, 10, 16, 24, 40, 51, 61, 12, 12, 14, 19, 26, 58, 60, 55,
+                  14, 13, 16, 24, 40, 57, 69, 56, 14, 17, 22, 29, 51, 87, 80, 62,
+                  18, 22, 37, 56, 68, 109, 103, 77, 24, 35, 55, 64, 81, 104, 113, 92,
+                  49, 64, 78, 87, 103, 121, 120, 101, 72, 92, 95, 98, 112, 100, 103, 99)
+
+
+class CompressionCancelled(Exception):
+    """Raised when a compression run notices its cancel event is set."""
+
+
+def compress_pdf(source_path, output_path, quality_preset='medium', target_mb=None, doc=None,
+                 workers=None, search=False, placement=True, progress=None, cancel=None):
+    """Compress source_path into output_path and return a result dict.
+
+    With target_mb set, the first of TARGET_ATTEMPTS whose estimated output
+    fits is written, or with search=True the settings found by SizeSearch;
+    otherwise the named preset is applied once. doc is the already-open
+    (possibly edited) document, saved as-is when the source is already under
+    the target size. workers and placement are passed to CompressionPlanner.
+
+    progress and cancel are described in the module docstring. A cancelled
+    run raises CompressionCancelled and removes any pass it already wrote to
+    output_path, so a half-done job never looks like a finished one.
+
+    The result holds the final 'size' in bytes, the 'dpi'/'quality' used
+    (None for a plain re-save), the number of full document 'passes' written,
+    the sampled 'trial_encodes' of a search and the image stats of the run
+    (see CompressionPlanner), including its parallel 'speedup'.
+    """
+    result = {'size': 0, 'original_size': os.path.getsize(source_path), 'dpi': None, 'quality': None,
+              'passes': 0, 'trial_encodes': 0, 'images': 0, 'encodes': 0, 'kept': 0, 'passthrough': 0,
+              'workers': 1, 'image_seconds': 0.0, 'cpu_seconds': 0.0, 'speedup': 1.0}
+
+    try:
+        _compress(source_path, output_path, quality_preset, target_mb, doc, workers, search, placement,
+                  progress, cancel, result)
+    except CompressionCancelled:
+        if result['passes']:
+            remove_file(output_path)
+        raise
+    return result
+
+
+def _compress(source_path, output_path, quality_preset, target_mb, doc, workers, search, placement,
+              progress, cancel, result):
+    if target_mb:
+        target_bytes = target_mb * 1024 * 1024
+
+        if result['original_size'] <= target_bytes:
+            # Just deflate and save
+            if doc is not None:
+                doc.save(output_path, **_PASS_OPTIONS)
+            else:
+                with fitz.open(source_path) as src:
+                    src.save(output_path, **_PASS_OPTIONS)
+            result.update(size=os.path.getsize(output_path), passes=1)
+            return
+
+        work_doc = fitz.open(source_path)
+        try:
+            _target_passes(work_doc, output_path, target_bytes, workers, search, placement, progress, cancel, result)
+        finally:
+            work_doc.close()
+        return
+
+    # Preset mode
+    dpi, jpg_q = COMPRESSION_PRESETS.get(quality_preset, (96, 75))
+    work_doc = fitz.open(source_path)
+    try:
+        planner = CompressionPlanner(work_doc, [(dpi, jpg_q)], workers, placement,
+                                     progress=progress, cancel=cancel)
+        _write_pass(planner, output_path, dpi, jpg_q, progress, cancel, result)
+    finally:
+        work_doc.close()
+
+
+def _target_passes(doc, output_path, target_bytes, workers, search, placement, progress, cancel, result):
+    """Write doc to output_path at the best settings found for target_bytes."""
+    # Estimates start from the document as a pass writes it: garbage collection
+    # and deflate alone can shrink a file far below its size on disk, and
+    # starting from that size would pick settings much lower than needed
+    _check_cancel(cancel)
+    rewritten = doc.tobytes(**_PASS_OPTIONS)
+    base_size = len(rewritten)
+    if base_size <= target_bytes:
+        _report(progress, 'pass', 1, None)
+        with open(output_path, "wb") as f:
+            f.write(rewritten)
+        result.update(size=base_size, passes=1)
+        return
+    del rewritten
+
+    if search:
+        _search_pass(doc, output_path, target_bytes, base_size, workers, placement, progress, cancel, result)
+        return
+
+    # All attempts are measured in memory from a single decode per image
+    planner = CompressionPlanner(doc, TARGET_ATTEMPTS, workers, placement, progress=progress, cancel=cancel)
+    first = len(TARGET_ATTEMPTS) - 1
+    for i, (dpi, jpg_q) in enumerate(TARGET_ATTEMPTS):
+        if planner.estimate_size(dpi, jpg_q, base_size) <= target_bytes:
+            first = i
+            break
+    # Estimates are close but not exact, so fall through to the next
+    # attempt in the rare case the written file still misses
+    for dpi, jpg_q in TARGET_ATTEMPTS[first:]:
+        _write_pass(planner, output_path, dpi, jpg_q, progress, cancel, result)
+        if result['size'] <= target_bytes:
+            break
+    # Best effort if the target was not reached
+
+
+def _write_pass(planner, output_path, dpi, jpg_q, progress, cancel, result):
+    _check_cancel(cancel)
+    _report(progress, 'pass', result['passes'] + 1, None)
+    planner.apply(dpi, jpg_q)
+    planner.doc.save(output_path, **_PASS_OPTIONS)
+    result.update(planner.stats)
+    result.update(size=os.path.getsize(output_path), dpi=dpi, quality=jpg_q, passes=result['passes'] + 1)
+
+
+def _search_pass(doc, output_path, target_bytes, base_size, workers, placement, progress, cancel, result):
+    """Search for the best fitting settings, encode every image once at them and save.
+
+    base_size is the size of doc written without any image changes.
+    """
+    search = SizeSearch(doc, base_size, placements=image_placements(doc) if placement else None,
+                        progress=progress, cancel=cancel)
+    goal = target_bytes
+    encodes = 0
+    for _ in range(SEARCH_REFINEMENTS + 1):
+        dpi, jpg_q = search.search(goal)
+        planner = CompressionPlanner(doc, [(dpi, jpg_q)], workers, placements=search.placements,
+                                     progress=progress, cancel=cancel)
+        encodes += planner.stats['encodes']
+        actual = planner.estimate_size(dpi, jpg_q, base_size)
+        if actual <= target_bytes or (dpi, jpg_q) == (SEARCH_DPIS[-1], SEARCH_QUALITIES[0]):
+            break
+        # The sample under-predicted: tighten the goal by the observed error and search again
+        goal *= search.estimate(dpi, jpg_q) / actual
+    _write_pass(planner, output_path, dpi, jpg_q, progress, cancel, result)
+    result.update(trial_encodes=search.trial_encodes, encodes=encodes)
+
+
+def downsample_images(doc, target_dpi, jpeg_quality, workers=1, placement=True):
+    """Re-encode large images in doc as JPEG no bigger than target_dpi allows.
+
+    Returns the planner stats dict; see CompressionPlanner.
+    """
+    planner = CompressionPlanner(doc, [(target_dpi, jpeg_quality)], workers, placement)
+    planner.apply(target_dpi, jpeg_quality)
+    return planner.stats
+
+
+class CompressionPlanner:
+    """Measures JPEG recompression of a document's images at several settings.
+
+    Each unique image is decoded once, resized once per DPI level and then
+    encoded for every (dpi, quality) setting it takes part in. The encoded
+    streams are kept in memory, so output sizes can be estimated for every
+    setting and the chosen one written without touching the pixels again.
+
+    With placement, an image is only resampled when its effective DPI at
+    its largest placement (see image_placements) is above the setting's;
+    placements can also be passed in when already measured. With workers > 1
+    (None sizes the pool to the machine) the per-image work runs in a
+    process pool whose workers each open their own handle on the document;
+    only the stream updates happen on the calling side.
+
+    Each image is compared with its raw stream before any work: JPEGs that
+    need not be re-encoded (see _reencode_worthwhile) are never decoded for
+    that setting. Encodes that come out no smaller than the raw stream are
+    dropped, so applying a setting never grows an image. Both are counted
+    per image for the setting last applied, as 'passthrough' and 'kept';
+    before any apply() they count images skipped at every setting and
+    images kept at any setting.
+
+    progress(stage, done, total) is called with stage 'images' as each image
+    is done, and cancel is checked in between (see compress_pdf).
+    """
+
+    def __init__(self, doc, settings, workers=1, placement=True, placements=None, progress=None, cancel=None):
+        self.doc = doc
+        self.settings = list(settings)
+        if placements is None and placement:
+            placements = image_placements(doc)
+        self.placements = placements or {}
+        self.encoded = {}    # (dpi, quality) -> {xref: (data, width, height, gray)}
+        self.raw_sizes = {}  # xref -> stream length as a pass writes it
+        self.kept = {}       # (dpi, quality) -> xrefs whose encode would not shrink them
+        self.passthrough = {}  # (dpi, quality) -> JPEG xrefs not worth re-encoding
+        self.stats = {'images': 0, 'encodes': 0, 'kept': 0, 'passthrough': 0, 'workers': 1,
+                      'image_seconds': 0.0, 'cpu_seconds': 0.0, 'speedup': 1.0}
+        self.progress = progress
+        self.cancel = cancel
+        self._encode(self._plan(), workers)
+
+    def _plan(self):
+        """One job per image: its xref plus every variant it needs to be encoded at."""
+        jobs = []
+        for xref, width, height in _image_candidates(self.doc):
+            variants = []
+            source_quality = None
+            for dpi, quality in self.settings:
+                size = _target_size(width, height, dpi, self.placements.get(xref))
+                if not size:
+                    continue
+                if xref not in self.raw_sizes:
+                    self.raw_sizes[xref], source_quality = _raw_info(self.doc, xref)
+                if _reencode_worthwhile(width, size, source_quality, quality):
+                    variants.append((dpi, quality) + size)
+                else:
+                    self.passthrough.setdefault((dpi, quality), set()).add(xref)
+            if source_quality is not None and not variants:
+                self.stats['passthrough'] += 1
+            if variants:
+                # Largest first so each level can be resized from the previous one
+                variants.sort(key=lambda v: v[2] * v[3], reverse=True)
+                jobs.append((xref, variants))
+        return jobs
+
+    def _encode(self, jobs, workers):
+        if workers is None:
+            workers = os.cpu_count() or 1
+        workers = max(1, min(workers, len(jobs)))
+
+        start = time.perf_counter()
+        if workers > 1:
+            # Workers open their own handle on the same document state
+            source = self.doc.name if self.doc.name and not self.doc.is_dirty else self.doc.write()
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(source,)) as pool:
+                results = self._collect(pool, jobs)
+        else:
+            results = []
+            for job in jobs:
+                _check_cancel(self.cancel)
+                results.append(_encode_variants(self.doc, job))
+                _report(self.progress, 'images', len(results), len(jobs))
+
+        for setting in self.settings:
+            self.encoded.setdefault(setting, {})
+        for result in results:
+            if result is None:
+                continue  # Skip errors on individual images
+            xref, gray, outputs, seconds = result
+            for dpi, quality, data, width, height in outputs:
+                if len(data) >= self.raw_sizes[xref]:
+                    self.kept.setdefault((dpi, quality), set()).add(xref)  # Re-encoding would not shrink it
+                    continue
+                self.encoded[(dpi, quality)][xref] = (data, width, height, gray)
+            self.stats['images'] += 1
+            self.stats['encodes'] += len(outputs)
+            self.stats['cpu_seconds'] += seconds
+        self.stats['kept'] = len(set().union(*self.kept.values()))
+        wall_seconds = time.perf_counter() - start
+
+        self.stats['workers'] = workers
+        self.stats['image_seconds'] += wall_seconds
+        # Summed per-image CPU time over elapsed time, i.e. the gain over a serial run
+        if self.stats['image_seconds'] > 0 and self.stats['images']:
+            self.stats['speedup'] = self.stats['cpu_seconds'] / self.stats['image_seconds']
+
+    def _collect(self, pool, jobs):
+        """Results of jobs run on pool, in completion order, reporting each as it lands.
+
+        The cancel event is checked at least every CANCEL_POLL_SECONDS, not
+        only when an image finishes; on cancel the queued images are dropped
+        and only those already running are waited for.
+        """
+        pending = {pool.submit(_encode_in_worker, job) for job in jobs}
+        results = []
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=CANCEL_POLL_SECONDS, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results.append(future.result())
+                    _report(self.progress, 'images', len(results), len(jobs))
+                _check_cancel(self.cancel)
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+        return results
+
+    def estimate_size(self, dpi, quality, current_size):
+        """Predict the file size after apply(dpi, quality), given the current file size."""
+        streams = self.encoded.get((dpi, quality), {})
+        saved = sum(self.raw_sizes[xref] - len(entry[0]) for xref, entry in streams.items())
+        return current_size - saved
+
+    def apply(self, dpi, quality):
+        """Write the streams encoded for (dpi, quality) into the document."""
+        self.stats['kept'] = len(self.kept.get((dpi, quality), ()))
+        self.stats['passthrough'] = len(self.passthrough.get((dpi, quality), ()))
+        for xref, (data, width, height, gray) in self.encoded.get((dpi, quality), {}).items():
+            _write_jpeg(self.doc, xref, data, width, height, gray)
+
+
+class SizeSearch:
+    """Finds the (dpi, quality) whose output lands just under a byte target.
+
+    Output sizes are predicted from a small sample of the images: each probe
+    encodes only the sampled images, measures JPEG bytes per output pixel and
+    extrapolates that to every image resized at the probed DPI. The highest
+    DPI that fits at SEARCH_DPI_QUALITY is found by bisection (falling back to
+    the lowest DPI), then the highest quality that still fits at that DPI,
+    so a search costs a bounded
+    number of sample encodes regardless of document size. Decoded and resized
+    sample pixels are cached so each probe only pays for the encode. Each
+    sample encode is reported to progress as stage 'search'.
+    """
+
+    def __init__(self, doc, current_size, sample_images=SEARCH_SAMPLE_IMAGES, placements=None,
+                 progress=None, cancel=None):
+        self.doc = doc
+        self.progress = progress
+        self.cancel = cancel
+        self.current_size = current_size
+        self.placements = placements or {}  # See image_placements
+        self.images = _image_candidates(doc)
+        self.raw_sizes = {}
+        self.source_qualities = {}  # xref -> estimated JPEG quality, None for other images
+        for xref, w, h in self.images:
+            self.raw_sizes[xref], self.source_qualities[xref] = _raw_info(doc, xref)
+        self.trial_encodes = 0
+        # Spread the sample over the size range, always including the largest image
+        by_area = sorted(self.images, key=lambda img: img[1] * img[2], reverse=True)
+        step = max(1, len(by_area) / sample_images) if by_area else 1
+        self.sample = [by_area[int(i * step)] for i in range(min(sample_images, len(by_area)))]
+        self._decoded = {}   # xref -> decoded sample pixels
+        self._resized = {}   # (xref, dpi) -> resized sample pixels
+        self._density = {}   # (dpi, quality) -> measured bytes per output pixel
+        self._estimates = {}
+
+    def estimate(self, dpi, quality):
+        """Predicted file size with every image over the DPI limit re-encoded."""
+        if (dpi, quality) in self._estimates:
+            return self._estimates[(dpi, quality)]
+        replaced = []
+        for xref, width, height in self.images:
+            size = _target_size(width, height, dpi, self.placements.get(xref))
+            if size and _reencode_worthwhile(width, size, self.source_qualities[xref], quality):
+                replaced.append((xref, size))
+        estimate = self.current_size
+        if replaced:
+            density = self._bytes_per_pixel(dpi, quality, replaced)
+            if density is not None:
+                # An image whose encode would not be smaller keeps its stream
+                estimate += sum(min(0, density * w * h - self.raw_sizes[xref]) for xref, (w, h) in replaced)
+        self._estimates[(dpi, quality)] = estimate
+        return estimate
+
+    def search(self, target_bytes):
+        """Return the (dpi, quality) with the largest predicted size under target_bytes."""
+        lo, hi = 0, len(SEARCH_DPIS) - 1
+        if self.estimate(SEARCH_DPIS[hi], SEARCH_QUALITIES[0]) > target_bytes:
+            return SEARCH_DPIS[hi], SEARCH_QUALITIES[0]  # Best effort
+        # Sizes shrink as DPI drops: find the first (highest) DPI that fits
+        if self.estimate(SEARCH_DPIS[hi], SEARCH_DPI_QUALITY) <= target_bytes:
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self.estimate(SEARCH_DPIS[mid], SEARCH_DPI_QUALITY) <= target_bytes:
+                    hi = mid
+                else:
+                    lo = mid + 1
+        dpi = SEARCH_DPIS[hi]
+        # Then the last (highest) quality that still fits at that DPI
+        lo, hi = 0, len(SEARCH_QUALITIES) - 1
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self.estimate(dpi, SEARCH_QUALITIES[mid]) <= target_bytes:
+                lo = mid
+            else:
+                hi = mid - 1
+        return dpi, SEARCH_QUALITIES[lo]
+
+    def _bytes_per_pixel(self, dpi, quality, replaced):
+        if (dpi, quality) in self._density:
+            return self._density[(dpi, quality)]
+        sizes = dict(replaced)
+        sample = [xref for xref, w, h in self.sample if xref in sizes] or [replaced[0][0]]
+        total_bytes = total_pixels = 0
+        for xref in sample:
+            _check_cancel(self.cancel)
+            pixels = self._sample_pixels(xref, dpi, sizes[xref])
+            if pixels is None:
+                continue
+            out_buffer = io.BytesIO()
+            pixels.save(out_buffer, format="JPEG", quality=quality, optimize=True)
+            self.trial_encodes += 1
+            _report(self.progress, 'search', self.trial_encodes, None)
+            total_bytes += out_buffer.tell()
+            total_pixels += pixels.width * pixels.height
+        density = total_bytes / total_pixels if total_pixels else None
+        self._density[(dpi, quality)] = density
+        return density
+
+    def _sample_pixels(self, xref, dpi, size):
+        key = (xref, dpi)
+        if key not in self._resized:
+            if xref not in self._decoded:
+                try:
+                    self._decoded[xref] = _decode_image(self.doc, xref)
+                except Exception:
+                    self._decoded[xref] = None
+            decoded = self._decoded[xref]
+            self._resized[key] = decoded.resize(size, Image.LANCZOS) if decoded else None
+        return self._resized[key]
+
+
+def _report(progress, stage, done, total):
+    if progress is not None:
+        progress(stage, done, total)
+
+
+def _check_cancel(cancel):
+    if cancel is not None and cancel.is_set():
+        raise CompressionCancelled("Compression cancelled")
+
+
+def _image_candidates(doc):
+    """List (xref, width, height) for every unique image worth recompressing."""
+    images = []
+    xrefs = set()
+    for page in doc:
+        for img in page.get_images():
+            xref, width, height = img[0], img[2], img[3]
+            if xref in xrefs:
+                continue
+            xrefs.add(xref)
+            # Skip small images (icons, logos) and stencil masks
+            if width < 100 or height < 100:
+                continue
+            if doc.xref_get_key(xref, "ImageMask")[1] == "true":
+                continue
+            images.append((xref, width, height))
+    return images
+
+
+def image_placements(doc):
+    """Map each image xref to the (width, height) in inches of its largest placement in doc.
+
+    Measured from the transform of every placement (page.get_image_info,
+    which also backs get_image_rects), so rotated and skewed placements
+    count at their real size. Images never found on a page are left out.
+    """
+    placements = {}
+    for page in doc:
+        for info in page.get_image_info(xrefs=True):
+            xref = info.get('xref')
+            if not xref:
+                continue  # Inline image
+            a, b, c, d = info['transform'][:4]
+            size = (math.hypot(a, b) / 72, math.hypot(c, d) / 72)
+            current = placements.get(xref)
+            if current is None or size[0] * size[1] > current[0] * current[1]:
+                placements[xref] = size
+    return placements
+
+
+def _target_size(width, height, target_dpi, placement=None):
+    """New (width, height) for an image at target_dpi, or None if it is small enough.
+
+    placement is the image's displayed (width, height) in inches, if known.
+    """
+    if placement and placement[0] > 0 and placement[1] > 0:
+        # Keep enough pixels for target_dpi along both displayed sides
+        scale = max(target_dpi * placement[0] / width, target_dpi * placement[1] / height)
+        if scale >= 1:
+            return None  # Effective DPI already at or below the target
+        return max(1, round(width * scale)), max(1, round(height * scale))
+    # We don't know the physical size of the image on the page,
+    # so limit the max dimension assuming an 8.27 inch (A4) width.
+    max_dim = int(8.27 * target_dpi * 1.5)  # *1.5 Slack
+    if width <= max_dim and height <= max_dim:
+        return None
+    scale = min(max_dim / width, max_dim / height)
+    return int(width * scale), int(height * scale)
+
+
+def _raw_info(doc, xref):
+    """Stream length of an image as a pass writes it and, for a plain JPEG, its estimated quality (else None)."""
+    raw = doc.xref_stream_raw(xref) or b""
+    image_filter = doc.xref_get_key(xref, "Filter")[1]
+    if image_filter == "null":
+        return len(zlib.compress(raw)), None  # Unfiltered streams are deflated on save
+    if image_filter not in ("/DCTDecode", "[/DCTDecode]"):
+        return len(raw), None
+    return len(raw), _jpeg_quality(raw)
+
+
+def _jpeg_quality(data):
+    """IJG quality (1-100) that JPEG data was most likely saved at, from its headers alone."""
+    try:
+        with Image.open(io.BytesIO(data)) as img:  # Reads the headers, not the pixels
+            table = img.quantization[0]
+    except Exception:
+        return None
+    scale = sum(table) * 100 / sum(_IJG_LUMINANCE)
+    return (200 - scale) / 2 if scale <= 100 else 5000 / scale
+
+
+def _reencode_worthwhile(width, size, source_quality, quality):
+    """False for a JPEG already at or below quality that resampling to size would barely shrink."""
+    if source_quality is None or source_quality > quality + 0.5:
+        return True
+    return size[0] < width * PASSTHROUGH_SCALE
+
+
+def _decode_image(doc, xref):
+    """Decode an image xref into an 8-bit gray or RGB PIL image."""
+    pix = fitz.Pixmap(doc, xref)
+    if pix.alpha:
+        pix = fitz.Pixmap(pix, 0)  # JPEG has no alpha; any SMask stays in place
+    if pix.colorspace is None or pix.colorspace.n not in (1, 3):
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+    mode = "L" if pix.n == 1 else "RGB"
+    return Image.frombytes(mode, (pix.width, pix.height), pix.samples)
+
+
+def _encode_variants(doc, job):
+    """Decode one image once and JPEG-encode it at every requested variant.
+
+    Returns (xref, gray, [(dpi, quality, data, width, height), ...], cpu_seconds)
+    or None if the image cannot be processed.
+    """
+    xref, variants = job
+    start = time.process_time()
+    try:
+        pil_img = _decode_image(doc, xref)
+        resized = {}  # (width, height) -> pixels shared by every quality at that size
+        outputs = []
+        for dpi, quality, new_w, new_h in variants:
+            if (new_w, new_h) not in resized:
+                pil_img = pil_img.resize((new_w, new_h), Image.LANCZOS)
+                resized[(new_w, new_h)] = pil_img
+            out_buffer = io.BytesIO()
+            resized[(new_w, new_h)].save(out_buffer, format="JPEG", quality=quality, optimize=True)
+            outputs.append((dpi, quality, out_buffer.getvalue(), new_w, new_h))
+    except Exception:
+        return None
+    return xref, pil_img.mode == "L", outputs, time.process_time() - start
+
+
+def _write_jpeg(doc, xref, data, width, height, gray):
+    """Replace an image stream with JPEG data and fix up its dictionary to match."""
+    doc.update_stream(xref, data, compress=False)
+    doc.xref_set_key(xref, "Filter", "/DCTDecode")
+    doc.xref_set_key(xref, "Width", str(width))
+    doc.xref_set_key(xref, "Height", str(height))
+    doc.xref_set_key(xref, "ColorSpace", "/DeviceGray" if gray else "/DeviceRGB")
+    doc.xref_set_key(xref, "BitsPerComponent", "8")
+    for key in ("DecodeParms", "Decode"):
+        doc.xref_set_key(xref, key, "null")
+    # A colour-key mask no longer matches lossy pixels; stencil masks stay
+    if doc.xref_get_key(xref, "Mask")[0] == "array":
+        doc.xref_set_key(xref, "Mask", "null")
+
+
+# Process-pool side: each worker keeps one open handle on the document
+
+_worker_doc = None
+
+
+def _init_worker(source):
+    global _worker_doc
+    if isinstance(source, bytes):
+        _worker_doc = fitz.open(stream=source, filetype="pdf")
+    else:
+        _worker_doc = fitz.open(source)
+
+
+def _encode_in_worker(job):
+    return _encode_variants(_worker_doc, job)
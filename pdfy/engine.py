@@ -0,0 +1,358 @@
+"""GUI-free editing session shared by the Tk editor and the batch CLI."""
+import os
+import shutil
+import tempfile
+import threading
+
+import fitz  # PyMuPDF
+
+from .compress import compress_pdf
+from .files import copy_to_temp, remove_file, save_atomic, sibling_temp, system_temp
+from .history import DeletePages, History, InsertPages, MovePage, RotatePage
+from .pages import page_runs
+from .render import DisplayListCache, render_fit, render_page
+from .thumbcache import file_fingerprint
+
+EXPORT_FORMATS = ("PNG", "JPG", "DOCX")
+
+
+class DocumentSession:
+    """An open PDF plus the page operations the editor performs on it.
+
+    Every edit goes through this class so the window and the command line
+    produce identical documents. Edits are recorded as invertible commands
+    (see history); pass undo_limit=0 for batch use where history is never
+    needed.
+    """
+
+    def __init__(self, doc, path=None, temp_path=None, undo_limit=100):
+        self.doc = doc
+        self.path = path            # Original file on disk
+        self.temp_path = temp_path  # Private working copy, if any
+        self.history = History(undo_limit)
+        # Bumped on every edit so background renderers can spot stale work;
+        # the lock serializes document access between the UI and workers.
+        self.generation = 0
+        self.lock = threading.RLock()
+        self.displaylists = DisplayListCache()  # Recorded pages, reused by every render
+        self._last_change = None  # (command, undone) of the latest edit, undo or redo
+        # Identifies the source file for the persistent thumbnail cache
+        self.fingerprint = file_fingerprint(path) if path and os.path.exists(path) else None
+        # Size and mtime of the original as last read or written by this session,
+        # so edits are only appended while nobody else has changed it
+        self._original_stat = _file_stat(path) if path and os.path.exists(path) else None
+
+    @classmethod
+    def open(cls, path, temp_copy=False, undo_limit=100):
+        """Open path for editing.
+
+        By default pages are read straight from path as they are needed, so
+        even a very large file opens at once. Overwriting that file later is
+        handled by save_in_place() and save(). With temp_copy the document is
+        read from a copy in the system temp dir instead, made up front.
+        """
+        temp_path = copy_to_temp(path) if temp_copy else None
+        try:
+            doc = fitz.open(temp_path or path)
+        except Exception:
+            remove_file(temp_path)
+            raise
+        return cls(doc, path=path, temp_path=temp_path, undo_limit=undo_limit)
+
+    def close(self):
+        with self.lock:
+            self.generation += 1
+            if self.doc:
+                try:
+                    self.doc.close()
+                except Exception:
+                    pass
+        remove_file(self.temp_path)
+        self.temp_path = None
+
+    def __len__(self):
+        return len(self.doc)
+
+    # Editing
+
+    def execute(self, command):
+        """Apply a history.Command and record it for undo."""
+        with self.lock:
+            if self.history.enabled:
+                command.capture(self)
+            command.do(self)
+            self.generation += 1
+            self._last_change = (command, False)
+        self.history.record(command)
+        return command
+
+    def delete_page(self, index):
+        if len(self.doc) == 1:
+            raise ValueError("A PDF must have at least one page.")
+        self.execute(DeletePages([index]))
+
+    def delete_pages(self, indices):
+        """Delete the given zero-based pages in one undoable step."""
+        indices = [p for p in indices if 0 <= p < len(self.doc)]
+        if len(set(indices)) == len(self.doc):
+            raise ValueError("A PDF must have at least one page.")
+        self.execute(DeletePages(indices))
+
+    def rotate_page(self, index, angle=90):
+        self.execute(RotatePage(index, angle))
+
+    def move_page(self, from_index, to_index):
+        """Move a page in front of to_index and return its new index."""
+        return self.execute(MovePage(from_index, to_index)).page
+
+    def insert_pdf(self, pdf_path, insert_at):
+        """Insert all pages of pdf_path starting at insert_at; returns the page count added."""
+        return self.execute(InsertPages(pdf_path, insert_at)).count
+
+    # Undo / redo
+
+    @property
+    def can_undo(self):
+        return bool(self.history.undo_stack)
+
+    @property
+    def can_redo(self):
+        return bool(self.history.redo_stack)
+
+    def undo(self):
+        """Revert the last edit; returns the page index it touched, or None if there was nothing to undo."""
+        with self.lock:
+            command = self.history.undo(self)
+            self.generation += 1
+            self._last_change = (command, True) if command else None
+        return command.page if command else None
+
+    def redo(self):
+        with self.lock:
+            command = self.history.redo(self)
+            self.generation += 1
+            self._last_change = (command, False) if command else None
+        return command.page if command else None
+
+    def remap_index(self, index):
+        """Index now of the page that was at index before the latest edit, undo or redo.
+
+        None when that page is gone or its content changed, so anything
+        rendered from it can be moved along with the page instead of redone.
+        """
+        if self._last_change is None:
+            return None
+        command, undone = self._last_change
+        return command.remap(index, undone)
+
+    # Output
+
+    def save(self, path, pages=None):
+        """Save the whole document, or only the given zero-based pages, to path.
+
+        Written through a sibling temp file that replaces path at the end, so
+        a crash or full disk never leaves a half-written file behind.
+        """
+        with self.lock:
+            if pages is None:
+                if self._is_own_file(path):
+                    self._rewrite_own_file()
+                else:
+                    save_atomic(self.doc, path)
+                return
+            if self._is_own_file(path):
+                self._detach()
+            new_pdf = fitz.open()
+            try:
+                for first, last in page_runs(pages):
+                    new_pdf.insert_pdf(self.doc, from_page=first, to_page=last)
+                save_atomic(new_pdf, path)
+            finally:
+                new_pdf.close()
+
+    def save_in_place(self, compact=False):
+        """Overwrite the original file with the current document.
+
+        Returns "incremental" when only the changed objects were appended,
+        which costs milliseconds however large the file is, or "full" for a
+        complete rewrite. Appending is possible while the document reads the
+        original directly (not a temp copy) and nobody else has changed it
+        since. The document is reopened from the file after every append:
+        MuPDF's in-memory state no longer matches the file it just extended,
+        and a second incremental save on top of it corrupts the file.
+        Otherwise, or with compact (which also drops unused objects and
+        deflates streams), the file is rewritten in full through a sibling
+        temp file that atomically replaces it.
+        """
+        with self.lock:
+            if not compact and self._can_append():
+                self.doc.save(self.path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+                self._swap_doc(fitz.open(self.path), None)
+                return "incremental"
+            options = dict(garbage=3, deflate=True) if compact else {}
+            if self._is_own_file(self.path):
+                self._rewrite_own_file(**options)
+                return "full"
+            save_atomic(self.doc, self.path, **options)
+            self._original_stat = None
+            # Read from the rewritten file again, so later saves can append to it
+            if self.temp_path:
+                self._reload_from_original()
+            else:
+                self._swap_doc(fitz.open(self.path), None)
+            return "full"
+
+    def _can_append(self):
+        return bool(self._is_own_file(self.path) and self.doc.can_save_incrementally()
+                    and self._original_stat is not None and _file_stat(self.path) == self._original_stat)
+
+    def _is_own_file(self, path):
+        # True when path is the file the document reads its pages from
+        name = self.doc.name
+        try:
+            return bool(name) and os.path.samefile(path, name)
+        except OSError:
+            return False
+
+    def _rewrite_own_file(self, **options):
+        # MuPDF reads pages lazily from doc.name, so that file can't be written
+        # over while the document is open (and Windows won't rename onto an open
+        # file). Save next to it, close, move the new file into place and reopen.
+        path = self.doc.name
+        temp_path = sibling_temp(path)
+        try:
+            self.doc.save(temp_path, **options)
+            shutil.copymode(path, temp_path)
+        except Exception:
+            remove_file(temp_path)
+            raise
+        self.displaylists.clear()
+        self.doc.close()
+        try:
+            os.replace(temp_path, path)
+        except OSError:
+            # The edits live on in the new file: carry on from it and report the failure
+            self._swap_doc(fitz.open(temp_path), temp_path)
+            self._original_stat = None
+            raise
+        self._swap_doc(fitz.open(path), None)
+
+    def _detach(self):
+        # Move the document onto a temp file holding its current state, before
+        # the file it reads from is overwritten with something else
+        temp_path = system_temp()
+        try:
+            self.doc.save(temp_path)
+            doc = fitz.open(temp_path)
+        except Exception:
+            remove_file(temp_path)
+            raise
+        self._swap_doc(doc, temp_path)
+        self._original_stat = None
+
+    def _reload_from_original(self):
+        # Work from a fresh copy of the rewritten original
+        temp_path = copy_to_temp(self.path)
+        try:
+            doc = fitz.open(temp_path)
+        except Exception:
+            remove_file(temp_path)
+            return
+        self._swap_doc(doc, temp_path)
+
+    def _swap_doc(self, doc, temp_path):
+        # Make doc (read from temp_path, or from the original when None) the session's document
+        old_doc, old_temp = self.doc, self.temp_path
+        self.doc, self.temp_path = doc, temp_path
+        self.generation += 1
+        self.fingerprint = file_fingerprint(self.path)
+        self._original_stat = _file_stat(self.path)
+        if not old_doc.is_closed:
+            try:
+                old_doc.close()
+            except Exception:
+                pass
+        if old_temp != temp_path:
+            remove_file(old_temp)
+
+    def displaylist(self, index, store=True):
+        """Cached DisplayList of a page for the current edit; see render.DisplayListCache."""
+        with self.lock:
+            return self.displaylists.get(self.doc, index, self.generation, store)
+
+    def render_page(self, index, zoom=2):
+        with self.lock:
+            return render_page(self.displaylist(index), zoom)
+
+    def page_size(self, index):
+        """Displayed (rotation-aware) width and height of a page in points."""
+        with self.lock:
+            rect = self.doc[index].rect
+            return rect.width, rect.height
+
+    def render_fit(self, index, width, height, dpr=1.0, oversample=1.0):
+        """Render a page at exactly the size it is displayed at; see render.fit_matrix."""
+        with self.lock:
+            return render_fit(self.displaylist(index), width, height, dpr, oversample)
+
+    def export_page(self, index, path, fmt):
+        """Export one page as PNG, JPG or DOCX (an image inside a Word document).
+
+        Raises ImportError when python-docx is needed but not installed.
+        """
+        fmt = fmt.upper()
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported format: {fmt}")
+        img = self.render_page(index, 2)
+        if fmt in ("PNG", "JPG"):
+            save_fmt = "JPEG" if fmt == "JPG" else fmt
+            if save_fmt == "JPEG" and img.mode != "RGB":
+                img = img.convert("RGB")
+            img.save(path, save_fmt)
+            return
+        from docx import Document
+        from docx.shared import Inches
+        word_doc = Document()
+        with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmp_img:
+            img.save(tmp_img.name, "PNG")
+        try:
+            word_doc.add_picture(tmp_img.name, width=Inches(6))
+        finally:
+            remove_file(tmp_img.name)
+        word_doc.save(path)
+
+    def compress(self, output_path, quality_preset='medium', target_mb=None, workers=None, search=False,
+                 placement=True, progress=None, cancel=None):
+        """Compress the document as it is now, unsaved edits included; see compress_pdf.
+
+        The lock is only held while a snapshot is taken: a document with
+        unsaved edits is written to a temp file first, otherwise the file it
+        reads from already holds its state. The image work reads that file
+        through its own handle, so it can run on a worker thread while the
+        session keeps serving renders.
+        """
+        snapshot = None
+        with self.lock:
+            if self._is_own_file(output_path):
+                self._detach()  # The file the document reads from is about to be overwritten
+            source_path = self.doc.name
+            if self.doc.is_dirty or not source_path:
+                snapshot = source_path = system_temp()
+                try:
+                    self.doc.save(snapshot)
+                except Exception:
+                    remove_file(snapshot)
+                    raise
+        try:
+            return compress_pdf(source_path, output_path, quality_preset, target_mb, workers=workers,
+                                search=search, placement=placement, progress=progress, cancel=cancel)
+        finally:
+            remove_file(snapshot)
+
+
+def _file_stat(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
@@ -0,0 +1,45 @@
+"""Temp file and atomic write helpers shared by the engine, merge and compress."""
+import os
+import shutil
+import tempfile
+import uuid
+
+
+def copy_to_temp(path):
+    """Copy path into the system temp dir under a unique name and return the copy's path."""
+    temp_path = system_temp(os.path.splitext(path)[1])
+    shutil.copy2(path, temp_path)
+    return temp_path
+
+
+def system_temp(ext=".pdf"):
+    """Unique, not yet existing path in the system temp dir."""
+    return os.path.join(tempfile.gettempdir(), f"pdfeditor_{uuid.uuid4().hex}{ext}")
+
+
+def save_atomic(doc, path, **options):
+    """doc.save(path, **options) via a temp file in the same directory renamed over path."""
+    temp_path = sibling_temp(path)
+    try:
+        doc.save(temp_path, **options)
+        if os.path.exists(path):
+            shutil.copymode(path, temp_path)
+        os.replace(temp_path, path)
+    except Exception:
+        remove_file(temp_path)
+        raise
+
+
+def sibling_temp(path):
+    """Unique hidden temp file name in path's directory, so it can be renamed over path."""
+    return os.path.join(os.path.dirname(os.path.abspath(path)),
+                        f".{os.path.basename(path)}.{uuid.uuid4().hex}.tmp")
+
+
+def remove_file(path):
+    """Delete path if it exists, ignoring errors."""
+    if path and os.path.exists(path):
+        try:
+            os.remove(path)
+        except Exception:
+            pass
@@ -0,0 +1,239 @@
+"""Undo/redo as a log of invertible edit commands.
+
+Rotations and moves are undone by applying their inverse, so they cost O(1)
+time and memory regardless of document size. Deleted pages are copied into a
+small side document so they can be put back without serializing the whole
+PDF.
+"""
+import bisect
+
+import fitz  # PyMuPDF
+
+from .pages import page_runs
+
+
+class Command:
+    """One undoable edit of a DocumentSession's document.
+
+    capture() runs before the first do() and only when history is kept, so
+    batch use never pays for undo bookkeeping. page is the page index worth
+    showing after the command is done or undone. remap() tells views which
+    pages kept their content and where they went, so what was rendered for
+    them can be reused.
+    """
+    page = 0
+
+    def capture(self, session):
+        pass
+
+    def remap(self, index, undone=False):
+        """New index of the page at index before do() (or undo()), or None if it is gone or changed."""
+        return None
+
+    def do(self, session):
+        raise NotImplementedError
+
+    def undo(self, session):
+        raise NotImplementedError
+
+
+class RotatePage(Command):
+    def __init__(self, index, angle):
+        self.page = index
+        self.angle = angle
+
+    def do(self, session):
+        page = session.doc[self.page]
+        page.set_rotation((page.rotation + self.angle) % 360)
+
+    def undo(self, session):
+        page = session.doc[self.page]
+        page.set_rotation((page.rotation - self.angle) % 360)
+
+    def remap(self, index, undone=False):
+        return None if index == self.page else index
+
+
+class MovePage(Command):
+    def __init__(self, from_index, to_index):
+        self.from_index = from_index
+        self.to_index = to_index
+        # fitz moves the page in front of to_index, one slot earlier when dragged down
+        self.page = to_index - 1 if from_index < to_index else to_index
+
+    def do(self, session):
+        _move_page(session.doc, self.from_index, self.to_index)
+
+    def undo(self, session):
+        if self.page < self.from_index:
+            _move_page(session.doc, self.page, self.from_index + 1)
+        elif self.page > self.from_index:
+            _move_page(session.doc, self.page, self.from_index)
+
+    def remap(self, index, undone=False):
+        source, target = (self.page, self.from_index) if undone else (self.from_index, self.page)
+        if index == source:
+            return target
+        index -= index > source
+        return index + (index >= target)
+
+
+class DeletePages(Command):
+    """Delete pages; their content is kept in a side document for undo.
+
+    The deletion is a single select() of the remaining pages, and the side
+    document is filled and emptied one run of consecutive pages at a time,
+    so large ranges cost a handful of MuPDF calls rather than one per page.
+
+    select() also drops outline entries and links that point at the deleted
+    pages, and copying pages does not carry links to pages outside the copy.
+    So the outline is kept when an entry points into the deletion, as are
+    the links of the deleted pages and of pages linking to them; undo puts
+    them back. Only pages with annotations are looked at for links.
+    """
+
+    def __init__(self, indices):
+        self.indices = sorted(set(indices))
+        self._deleted = set(self.indices)
+        self.page = self.indices[0] if self.indices else 0
+        self.trash = None
+        self.toc = None    # Full outline, when part of it points at a deleted page
+        self.links = {}    # Page index -> its links, for pages whose links the deletion breaks
+
+    def capture(self, session):
+        doc = session.doc
+        self.trash = _copy_pages(doc, self.indices)
+        toc = doc.get_toc(simple=False)
+        if any(entry[2] - 1 in self._deleted for entry in toc):
+            self.toc = toc
+        for index in range(len(doc)):
+            if doc.xref_get_key(doc.page_xref(index), "Annots")[0] == "null":
+                continue
+            links = doc[index].get_links()
+            if links and (index in self._deleted or any(
+                    link['kind'] == fitz.LINK_GOTO and link.get('page') in self._deleted for link in links)):
+                self.links[index] = links
+
+    def do(self, session):
+        session.doc.select([p for p in range(len(session.doc)) if p not in self._deleted])
+
+    def undo(self, session):
+        # Ascending order puts every page back at its original index
+        k = 0
+        for first, last in page_runs(self.indices):
+            session.doc.insert_pdf(self.trash, from_page=k, to_page=k + last - first, start_at=first)
+            k += last - first + 1
+        for index, links in self.links.items():
+            page = session.doc[index]
+            for link in page.get_links():
+                page.delete_link(link)
+            for link in links:
+                page.insert_link(link)
+        if self.toc is not None:
+            session.doc.set_toc(self.toc)
+
+    def remap(self, index, undone=False):
+        if undone:
+            # Step over the restored pages in front of index
+            for p in self.indices:
+                if p > index:
+                    break
+                index += 1
+            return index
+        if index in self._deleted:
+            return None
+        return index - bisect.bisect_left(self.indices, index)
+
+
+class InsertPages(Command):
+    """Insert all pages of another PDF at a position."""
+
+    def __init__(self, pdf_path, insert_at):
+        self.pdf_path = pdf_path
+        self.page = insert_at
+        self.count = 0
+        self.trash = None  # Inserted pages, kept on undo for redo
+
+    def do(self, session):
+        if self.trash is not None:
+            session.doc.insert_pdf(self.trash, start_at=self.page)
+            return
+        ext_pdf = fitz.open(self.pdf_path)
+        try:
+            session.doc.insert_pdf(ext_pdf, start_at=self.page)
+            self.count = len(ext_pdf)
+        finally:
+            ext_pdf.close()
+
+    def undo(self, session):
+        pages = list(range(self.page, self.page + self.count))
+        if self.trash is None:
+            self.trash = _copy_pages(session.doc, pages)
+        session.doc.delete_pages(pages[0], pages[-1])
+
+    def remap(self, index, undone=False):
+        if not undone:
+            return index + self.count if index >= self.page else index
+        if index < self.page:
+            return index
+        return index - self.count if index >= self.page + self.count else None
+
+
+class History:
+    """Undo and redo stacks of commands.
+
+    limit caps the number of undo steps (0 disables history); the oldest
+    steps are dropped first to stay within it.
+    """
+
+    def __init__(self, limit=100):
+        self.limit = limit
+        self.undo_stack = []
+        self.redo_stack = []
+
+    @property
+    def enabled(self):
+        return self.limit > 0
+
+    def record(self, command):
+        if not self.enabled:
+            return
+        self.undo_stack.append(command)
+        self.redo_stack.clear()
+        while len(self.undo_stack) > self.limit:
+            self.undo_stack.pop(0)
+
+    def undo(self, session):
+        """Revert the last command and return it, or None when there is nothing to undo."""
+        if not self.undo_stack:
+            return None
+        # Only moved to the redo stack once it worked, so a failed undo can be retried
+        command = self.undo_stack[-1]
+        command.undo(session)
+        self.redo_stack.append(self.undo_stack.pop())
+        return command
+
+    def redo(self, session):
+        if not self.redo_stack:
+            return None
+        command = self.redo_stack[-1]
+        command.do(session)
+        self.undo_stack.append(self.redo_stack.pop())
+        return command
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+
+
+def _move_page(doc, from_index, to_index):
+    # Move a page in front of to_index; fitz only accepts -1 for "after the last page"
+    doc.move_page(from_index, -1 if to_index >= len(doc) else to_index)
+
+
+def _copy_pages(doc, indices):
+    """Copy the given pages of doc into a new in-memory document, in order."""
+    copy = fitz.open()
+    for first, last in page_runs(indices):
+        copy.insert_pdf(doc, from_page=first, to_page=last)
+    return copy
@@ -0,0 +1,213 @@
+"""Combining several PDF files into one.
+
+Inputs are read and checked on a small thread pool a few files ahead of
+the writer, which appends them in order; all MuPDF work stays on the
+calling thread. To keep memory bounded for hundreds of inputs, the pages
+merged so far are flushed to a work file next to the output every
+flush_bytes of input and the document is reopened from it, so earlier
+inputs are read back from disk instead of held in RAM. insert_pdf()
+copies each input's resources independently, so before the output is
+written once, dedupe_streams() makes every identical image, font file and
+colour profile a single object; garbage collection then drops the
+orphaned copies and merges the resource dictionaries that now match.
+"""
+import hashlib
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import fitz  # PyMuPDF
+
+from .files import remove_file, save_atomic, sibling_temp
+
+try:
+    import psutil
+except ImportError:  # Optional: without it memory is only reported on Linux
+    psutil = None
+
+PREFETCH_FILES = 4
+FLUSH_BYTES = 64 * 1024 * 1024
+
+_REF = re.compile(rb"(\d+) 0 R")
+# Streams referenced through these keys are shareable resources, as are images
+_RESOURCE_REFS = re.compile(rb"/(?:FontFile[23]?|ICCBased|SMask|Mask)\s*(\d+) 0 R")
+
+
+def merge_pdfs(paths, output_path, workers=None, prefetch=PREFETCH_FILES, flush_bytes=FLUSH_BYTES,
+               dedupe=True):
+    """Concatenate the PDFs in paths, in order, into output_path and return a result dict.
+
+    Raises ValueError naming the file when an input is not a PDF or is
+    password protected; output_path is left untouched then. With dedupe,
+    resources repeated across inputs are stored once (see dedupe_streams).
+    The result holds the number of 'files' and 'pages', the output 'size'
+    in bytes, the wall time in 'seconds', the work file 'flushes', the
+    'duplicates' removed and the stream 'bytes_saved' by that, and the
+    'memory_growth' of the merge in bytes: the largest increase of the
+    process' resident memory over its size when the merge started, sampled
+    after every input and around the final save (None where it can't be read).
+    """
+    start = time.perf_counter()
+    result = {'files': len(paths), 'pages': 0, 'size': 0, 'seconds': 0.0, 'flushes': 0,
+              'duplicates': 0, 'bytes_saved': 0, 'memory_growth': None}
+    base_rss = resident_memory()
+
+    def sample_memory():
+        rss = resident_memory()
+        if rss is not None and base_rss is not None:
+            result['memory_growth'] = max(result['memory_growth'] or 0, rss - base_rss)
+
+    work_path = sibling_temp(output_path)
+    merged = fitz.open()
+    pending = 0  # Input bytes appended since the last flush
+    workers = workers or min(PREFETCH_FILES, len(paths)) or 1
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            queued = deque()
+            remaining = iter(paths)
+            for _ in range(max(1, prefetch)):
+                _submit_next(pool, queued, remaining)
+            while queued:
+                path, data = queued.popleft().result()
+                _submit_next(pool, queued, remaining)
+                src = fitz.open(stream=data, filetype="pdf")
+                try:
+                    if src.needs_pass:
+                        raise ValueError(f"{os.path.basename(path)} is password protected")
+                    merged.insert_pdf(src)
+                finally:
+                    src.close()
+                pending += len(data)
+                del data
+                sample_memory()
+                if pending >= flush_bytes and queued:
+                    merged = _flush(merged, work_path, first=not result['flushes'])
+                    result['flushes'] += 1
+                    pending = 0
+        result['pages'] = len(merged)
+        if dedupe:
+            result.update(dedupe_streams(merged))
+        sample_memory()
+        # Drops the orphaned duplicates and merges the dictionaries that now match
+        save_atomic(merged, output_path, garbage=3)
+        sample_memory()
+    finally:
+        merged.close()
+        remove_file(work_path)
+    result['size'] = os.path.getsize(output_path)
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def dedupe_streams(doc):
+    """Store identical image, font file and colour profile streams of doc once.
+
+    Candidates are hashed by their raw (still encoded) bytes and their
+    dictionary, so only byte-identical resources are shared. References to
+    duplicates are rewritten to the lowest numbered copy; the duplicates
+    stay in the file until it is saved with garbage collection. This repeats
+    until nothing changes, since images referring to colour profiles or soft
+    masks only match once those have been merged. Returns a dict with the
+    number of 'duplicates' removed and the raw stream 'bytes_saved'.
+    """
+    objects = {}  # xref -> object source, dictionary only for streams
+    streams = set()
+    candidates = set()
+    for xref in range(1, doc.xref_length()):
+        try:
+            source = doc.xref_object(xref, compressed=True).encode()
+        except Exception:
+            continue  # Free or broken entry
+        objects[xref] = source
+        candidates.update(int(ref) for ref in _RESOURCE_REFS.findall(source))
+        if doc.xref_is_stream(xref):
+            streams.add(xref)
+            if doc.xref_get_key(xref, "Subtype")[1] == "/Image":
+                candidates.add(xref)
+    candidates = sorted(candidates & streams)
+    digests = {xref: hashlib.sha1(doc.xref_stream_raw(xref) or b"").digest() for xref in candidates}
+
+    canonical = {}  # Duplicate xref -> the copy that replaces it
+
+    def resolve(match):
+        xref = int(match.group(1))
+        return b"%d 0 R" % canonical.get(xref, xref)
+
+    def expand(source, depth=0):
+        # Inline referenced plain objects (colour space arrays and the like),
+        # which each input has its own copy of; streams stay references
+        def inline(match):
+            xref = canonical.get(int(match.group(1)), int(match.group(1)))
+            if xref in streams or xref not in objects or depth >= 4:
+                return b"%d 0 R" % xref
+            return b"(" + expand(objects[xref], depth + 1) + b")"
+        return _REF.sub(inline, source)
+
+    while True:
+        seen = {}
+        merged = 0
+        for xref in candidates:
+            if xref in canonical:
+                continue
+            key = (digests[xref], expand(objects[xref]))
+            first = seen.setdefault(key, xref)
+            if first != xref:
+                canonical[xref] = first
+                merged += 1
+        if not merged:
+            break
+
+    saved = sum(len(doc.xref_stream_raw(xref) or b"") for xref in canonical)
+    if canonical:
+        for xref, source in objects.items():
+            if xref in canonical or not any(int(ref) in canonical for ref in _REF.findall(source)):
+                continue
+            if doc.xref_is_stream(xref):
+                # update_object() would drop the stream data; rewrite key by key
+                for key in doc.xref_get_keys(xref):
+                    kind, value = doc.xref_get_key(xref, key)
+                    rewritten = _REF.sub(resolve, value.encode()).decode()
+                    if rewritten != value:
+                        doc.xref_set_key(xref, key, rewritten)
+            else:
+                doc.update_object(xref, _REF.sub(resolve, source).decode())
+    return {'duplicates': len(canonical), 'bytes_saved': saved}
+
+
+def resident_memory():
+    """Current resident memory of this process in bytes, or None if unknown."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _submit_next(pool, queued, remaining):
+    path = next(remaining, None)
+    if path is not None:
+        queued.append(pool.submit(_read_input, path))
+
+
+def _read_input(path):
+    # Runs on the pool: plain file I/O and a header check, no MuPDF calls
+    with open(path, "rb") as f:
+        data = f.read()
+    if b"%PDF-" not in data[:1024]:
+        raise ValueError(f"{os.path.basename(path)} is not a PDF file")
+    return path, data
+
+
+def _flush(merged, work_path, first):
+    # Append what was merged since the last flush to the work file and
+    # continue from a document that reads it back lazily
+    if first:
+        merged.save(work_path)
+    else:
+        merged.save(work_path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+    merged.close()
+    return fitz.open(work_path)
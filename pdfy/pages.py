@@ -0,0 +1,41 @@
+"""Page-range parsing shared by the editor dialogs and the batch CLI."""
+
+
+def parse_page_spec(spec, page_count):
+    """Parse a 1-based spec like "1,3,5-7" into sorted zero-based page indices.
+
+    Pages outside 1..page_count are ignored. Raises ValueError when the spec is
+    malformed or selects no page at all.
+    """
+    raw = spec.replace(' ', '')
+    if not raw:
+        raise ValueError("Empty page selection.")
+    pages = set()
+    for part in raw.split(','):
+        if '-' in part:
+            start, end = part.split('-')
+            start, end = int(start), int(end)
+            if start > end:
+                raise ValueError(f"Invalid range: {part}")
+            pages.update(range(max(start, 1), min(end, page_count) + 1))
+        else:
+            pages.add(int(part))
+    pages = [p - 1 for p in sorted(pages) if 1 <= p <= page_count]
+    if not pages:
+        raise ValueError("No valid pages selected.")
+    return pages
+
+
+def page_runs(pages):
+    """Coalesce page indices into (first, last) runs of consecutive ascending pages.
+
+    Order is kept, so [0, 1, 2, 7, 3] gives [(0, 2), (7, 7), (3, 3)]. Bulk
+    operations take one MuPDF call per run instead of one per page.
+    """
+    runs = []
+    for p in pages:
+        if runs and p == runs[-1][1] + 1:
+            runs[-1][1] = p
+        else:
+            runs.append([p, p])
+    return [tuple(run) for run in runs]
@@ -0,0 +1,301 @@
+"""Cached, prefetching preview rendering for the page viewer.
+
+Pages are rendered on a background thread from the live document (see
+render.RenderSource) and kept in a byte-bounded LRU, so paging back and
+forth is served from memory and the UI thread never renders itself.
+It can still stall while a render runs: PyMuPDF holds the GIL for the
+whole of each call, such as building a page's display list or drawing
+one band or tile, so those calls are kept short rather than made free.
+Full renders run band by band and are abandoned between bands once the
+user has moved to another page. Zoomed views are rendered as tiles, so
+only the visible part of a deep zoom is ever rasterized. Render failures
+are logged to the "pdfy.preview" logger and the page or tile is skipped.
+"""
+import logging
+import threading
+from collections import OrderedDict
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+from .render import band_clips, fit_matrix, pixmap_to_image, render_fit
+
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+PREFETCH_PAGES = 3
+RENDER_BANDS = 4
+DRAFT_SCALE = 0.25  # Size of the quick first-stage render relative to the full one
+TILE_SIZE = 256
+
+logger = logging.getLogger(__name__)
+
+
+def image_bytes(img):
+    """Approximate memory held by a PIL image (PIL stores RGB as 4 bytes per pixel)."""
+    return img.width * img.height * (1 if img.mode == "L" else 4)
+
+
+class PreviewCache:
+    """LRU of rendered images, bounded by the memory their pixels take.
+
+    Keys start with the edit generation, followed by whatever identifies the
+    render (page, size or scale, tile), so an edit or a resize simply misses.
+    Safe to use from several threads.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.total = 0
+        self.hits = 0
+        self.misses = 0
+        self._images = OrderedDict()  # key -> image, most recent last
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._images
+
+    def get(self, key):
+        with self._lock:
+            img = self._images.get(key)
+            if img is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._images.move_to_end(key)
+            return img
+
+    def put(self, key, img):
+        with self._lock:
+            if key in self._images:
+                self.total -= image_bytes(self._images.pop(key))
+            self._images[key] = img
+            self.total += image_bytes(img)
+            while self.total > self.max_bytes and len(self._images) > 1:
+                _, evicted = self._images.popitem(last=False)
+                self.total -= image_bytes(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._images.clear()
+            self.total = 0
+
+
+class PreviewRenderer:
+    """Background renderer feeding a PreviewCache.
+
+    request() answers from the cache or queues the page, then queues the
+    next prefetch pages in the paging direction (and one behind) so they
+    are ready before they are asked for. on_ready(key, image, final) is
+    called from the worker thread for the most recently requested page:
+    with final=False for the draft (when one was asked for), then with
+    final=True for the full render. Work for pages no longer requested is
+    cancelled.
+    """
+
+    def __init__(self, source, on_ready=None, cache=None, prefetch=PREFETCH_PAGES):
+        self.source = source
+        self.on_ready = on_ready
+        self.cache = cache or PreviewCache()
+        self.prefetch = prefetch
+        self._generation = source.generation
+        self._pending = []  # Keys still to render, most urgent first
+        self._requested = set()  # Keys of the latest request; anything else is cancelled
+        self._wanted = None
+        self._draft = None  # Wanted key that should get a quick draft first
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def request(self, index, width, height, direction=1, draft=False):
+        """Return the cached render of page index at width x height, or None once it is queued.
+
+        With draft, a low resolution render is delivered before the full one;
+        use it when there is no other placeholder (such as a thumbnail) to show.
+        """
+        generation = self.source.generation
+        if generation != self._generation:
+            # Everything cached belongs to the document before the edit
+            self._generation = generation
+            self.cache.clear()
+        key = (generation, index, width, height)
+        page_count = len(self.source.session)
+        nearby = [index + direction * k for k in range(1, self.prefetch + 1)] + [index - direction]
+        keys = [(generation, i, width, height) for i in nearby if 0 <= i < page_count]
+        # Under the condition so a render finishing right now is either found or announced
+        with self._cond:
+            img = self.cache.get(key)
+            if img is None:
+                keys.insert(0, key)
+            self._wanted = None if img is not None else key
+            self._draft = key if draft and img is None else None
+            # Replace, not extend: pages the user has moved away from are no longer urgent
+            self._pending = [k for k in keys if k not in self.cache]
+            self._requested = set(self._pending)
+            self._cond.notify()
+        return img
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._pending = []
+            self._requested = set()
+            self._cond.notify()
+        self.cache.clear()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                key = self._pending.pop(0)
+            if key in self.cache:
+                continue
+            try:
+                if key == self._draft:
+                    self._render_draft(key)
+                img = self._render_full(key)
+            except Exception:
+                logger.exception("Preview render of page %d failed", key[1])
+                continue
+            if img is None:
+                continue  # Cancelled, or edited or closed since it was queued
+            with self._cond:
+                self.cache.put(key, img)
+                ready = key == self._wanted
+            if ready and self.on_ready:
+                self.on_ready(key, img, True)
+
+    def _cancelled(self, key):
+        with self._cond:
+            return self._closed or key not in self._requested
+
+    def _render_draft(self, key):
+        generation, index, width, height = key
+        displaylist = self.source.displaylist(index, generation)
+        if displaylist is None:
+            return
+        img = self.source.run(generation, render_fit, displaylist,
+                              max(1, int(width * DRAFT_SCALE)), max(1, int(height * DRAFT_SCALE)))
+        if img is not None and key == self._wanted and self.on_ready:
+            self.on_ready(key, img, False)
+
+    def _render_full(self, key):
+        """Render key band by band, or return None if cancelled or stale part way."""
+        generation, index, width, height = key
+        displaylist = self.source.displaylist(index, generation)
+        if displaylist is None:
+            return None
+        matrix = fit_matrix(displaylist, width, height)
+        full = (displaylist.rect * matrix).irect
+        img = Image.new("RGB", (full.width, full.height), "white")
+        for clip in band_clips(displaylist.rect, matrix, RENDER_BANDS):
+            if self._cancelled(key):
+                return None
+            pix = self.source.run(generation, lambda: displaylist.get_pixmap(matrix=matrix, clip=clip))
+            if pix is None:
+                return None
+            img.paste(pixmap_to_image(pix), (pix.x - full.x0, pix.y - full.y0))
+        return img
+
+
+class TileRenderer:
+    """Renders square tiles of a zoomed page on a worker thread.
+
+    Tile (tx, ty) covers tile_size pixels of the page rendered at scale,
+    starting at (tx * tile_size, ty * tile_size). Each tile is rasterized
+    through a clip rect on the page's DisplayList, so a deep zoom costs
+    the visible tiles rather than a bitmap of the whole page. Tiles are
+    cached per (generation, page, scale, tx, ty); on_ready(key, image) is
+    called from the worker for each tile of the latest request.
+    """
+
+    def __init__(self, source, on_ready=None, cache=None, tile_size=TILE_SIZE):
+        self.source = source
+        self.on_ready = on_ready
+        self.cache = cache or PreviewCache()
+        self.tile_size = tile_size
+        self._generation = source.generation
+        self._pending = []
+        self._requested = set()
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def request(self, index, scale, tiles):
+        """Return {(tx, ty): image} for tiles already cached; queue the rest in the given order."""
+        generation = self.source.generation
+        if generation != self._generation:
+            self._generation = generation
+            self.cache.clear()
+        found = {}
+        with self._cond:
+            pending = []
+            for tile in tiles:
+                key = (generation, index, scale) + tuple(tile)
+                img = self.cache.get(key)
+                if img is None:
+                    pending.append(key)
+                else:
+                    found[tile] = img
+            # Tiles scrolled out of view since the last request are dropped
+            self._pending = pending
+            self._requested = set(pending)
+            self._cond.notify()
+        return found
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._pending = []
+            self._requested = set()
+            self._cond.notify()
+        self.cache.clear()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                key = self._pending.pop(0)
+            if key in self.cache:
+                continue
+            try:
+                img = self._render(key)
+            except Exception:
+                logger.exception("Tile render of page %d failed", key[1])
+                continue
+            if img is None:
+                continue
+            with self._cond:
+                self.cache.put(key, img)
+                ready = key in self._requested
+            if ready and self.on_ready:
+                self.on_ready(key, img)
+
+    def _render(self, key):
+        generation, index, scale, tx, ty = key
+        displaylist = self.source.displaylist(index, generation)
+        if displaylist is None:
+            return None
+        matrix = fitz.Matrix(scale, scale)
+        full = (displaylist.rect * matrix).irect
+        size = self.tile_size
+        tile = fitz.IRect(full.x0 + tx * size, full.y0 + ty * size,
+                          full.x0 + (tx + 1) * size, full.y0 + (ty + 1) * size) & full
+        if tile.is_empty:
+            return None
+        clip = fitz.Rect(tile) * ~matrix
+        pix = self.source.run(generation, lambda: displaylist.get_pixmap(matrix=matrix, clip=clip))
+        if pix is None:
+            return None
+        img = pixmap_to_image(pix)
+        if (pix.x, pix.y, pix.width, pix.height) != (tile.x0, tile.y0, tile.width, tile.height):
+            # The clip rounds outwards; trim to the tile's exact pixels
+            img = img.crop((tile.x0 - pix.x, tile.y0 - pix.y, tile.x1 - pix.x, tile.y1 - pix.y))
+        return img
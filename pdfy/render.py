@@ -0,0 +1,171 @@
+"""Rasterisation helpers that turn fitz pages into PIL images.
+
+The render functions accept a fitz.Page or a fitz.DisplayList of one;
+both have the rect and get_pixmap() they use.
+"""
+from collections import OrderedDict
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+THUMB_WIDTH = 180
+DISPLAYLIST_PAGES = 32
+
+
+def pixmap_to_image(pix):
+    """Wrap a pixmap's samples as a PIL image without a PNG encode/decode.
+
+    Gray and RGBA pixmaps are shared with PIL as-is; RGB is unpacked once
+    into PIL's 4-byte layout. Other colorspaces are converted to RGB first.
+    """
+    if pix.colorspace is None or pix.colorspace.n not in (1, 3):
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+    mode = ("L" if pix.colorspace.n == 1 else "RGB") + ("A" if pix.alpha else "")
+    img = Image.frombuffer(mode, (pix.width, pix.height), pix.samples_mv, "raw", mode, pix.stride, 1)
+    if img.readonly:
+        img._pixmap = pix  # The image maps the pixmap's memory; keep it alive
+    return img
+
+
+def render_page(page, zoom=1.0):
+    """Render a page at the given zoom factor and return a PIL image."""
+    return pixmap_to_image(page.get_pixmap(matrix=fitz.Matrix(zoom, zoom)))
+
+
+def fit_matrix(page, width, height, dpr=1.0, oversample=1.0):
+    """Matrix that renders page (or its DisplayList) at the largest size fitting width x height.
+
+    page.rect already reflects the page's rotation, and get_pixmap applies
+    it, so the pixmap comes out exactly at the displayed pixel size. dpr is
+    the device pixel ratio of the target surface; oversample > 1 renders
+    extra resolution for a zoomed view to crop from.
+    """
+    rect = page.rect
+    scale = min(width / rect.width, height / rect.height) * dpr * oversample
+    return fitz.Matrix(scale, scale)
+
+
+def render_fit(page, width, height, dpr=1.0, oversample=1.0):
+    """Render page to fit width x height pixels directly, with no resample pass."""
+    return pixmap_to_image(page.get_pixmap(matrix=fit_matrix(page, width, height, dpr, oversample)))
+
+
+def band_clips(rect, matrix, bands):
+    """Split rect into horizontal clips that rasterize to adjacent pixel rows under matrix.
+
+    Rendering a DisplayList band by band gives identical pixels to a single
+    render, with a point between bands where the work can be abandoned.
+    """
+    full = (rect * matrix).irect
+    rows = [full.y0 + full.height * k // bands for k in range(bands + 1)]
+    return [fitz.Rect(rect.x0, y0 / matrix.d, rect.x1, y1 / matrix.d)
+            for y0, y1 in zip(rows, rows[1:]) if y1 > y0]
+
+
+def render_thumbnail(page, width=THUMB_WIDTH):
+    """Render a small preview of a page at the given width."""
+    scale = width / page.rect.width
+    return pixmap_to_image(page.get_pixmap(matrix=fitz.Matrix(scale, scale)))
+
+
+class DisplayListCache:
+    """Bounded LRU of fitz.DisplayList recordings of a document's pages.
+
+    Interpreting a page's content stream is most of the work of rendering a
+    vector-heavy page. A DisplayList records it once, after which renders at
+    any scale or clip only rasterize. Entries belong to one edit generation
+    and are dropped when it changes. Not locked itself; use it under the
+    session lock like the document.
+    """
+
+    def __init__(self, max_pages=DISPLAYLIST_PAGES):
+        self.max_pages = max_pages
+        self.hits = 0
+        self.misses = 0  # Lookups that recorded the page
+        self.probe_misses = 0  # store=False lookups that found nothing and recorded nothing
+        self._generation = None
+        self._lists = OrderedDict()  # page index -> DisplayList, most recent last
+
+    def get(self, doc, index, generation, store=True):
+        """DisplayList of doc[index], recorded on a miss.
+
+        With store=False a miss returns None instead, for one-off renders
+        (such as thumbnails) that should use a recording but not evict one.
+        """
+        if generation != self._generation:
+            self._generation = generation
+            self._lists.clear()
+        displaylist = self._lists.get(index)
+        if displaylist is not None:
+            self.hits += 1
+            self._lists.move_to_end(index)
+            return displaylist
+        if not store:
+            self.probe_misses += 1
+            return None
+        self.misses += 1
+        displaylist = doc[index].get_displaylist()
+        self._lists[index] = displaylist
+        while len(self._lists) > self.max_pages:
+            self._lists.popitem(last=False)
+        return displaylist
+
+    def clear(self):
+        self._lists.clear()
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'probe_misses': self.probe_misses,
+                'pages': len(self._lists)}
+
+
+class RenderSource:
+    """Background-thread access to the live, edited document of a session.
+
+    Workers render straight from the session's in-memory document, so they
+    never reparse the file on disk and always see the current edit state.
+    Each job is tied to the edit generation it was queued for; once the
+    document has been edited the job is stale and render() returns None.
+    """
+
+    def __init__(self, session):
+        self.session = session
+
+    @property
+    def generation(self):
+        return self.session.generation
+
+    def render(self, index, render_func, generation, *args):
+        """Return render_func(page, *args) for page index, or None if stale or out of range."""
+        with self.session.lock:
+            if generation != self.session.generation or not 0 <= index < len(self.session.doc):
+                return None
+            return render_func(self.session.doc[index], *args)
+
+    def displaylist(self, index, generation):
+        """The session's cached DisplayList of page index, or None if stale or out of range."""
+        with self.session.lock:
+            if generation != self.session.generation or not 0 <= index < len(self.session.doc):
+                return None
+            return self.session.displaylist(index)
+
+    def thumbnail(self, index, generation, width=THUMB_WIDTH, cache=None):
+        """Thumbnail of page index, through a thumbcache.ThumbnailCache when given; None if stale.
+
+        A DisplayList already recorded for the page is reused, but none is
+        recorded just for a thumbnail.
+        """
+        with self.session.lock:
+            if generation != self.session.generation or not 0 <= index < len(self.session.doc):
+                return None
+            page = self.session.doc[index]
+            displaylist = self.session.displaylist(index, store=False)
+            if cache and self.session.fingerprint:
+                return cache.thumbnail(page, self.session.fingerprint, width, displaylist)
+            return render_thumbnail(displaylist or page, width)
+
+    def run(self, generation, func, *args):
+        """Return func(*args) under the document lock, or None if the document has changed."""
+        with self.session.lock:
+            if generation != self.session.generation:
+                return None
+            return func(*args)
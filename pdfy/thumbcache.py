@@ -0,0 +1,135 @@
+"""Persistent on-disk cache of page thumbnails.
+
+Entries are keyed by a fingerprint of the source file plus a hash of the
+page's own dictionary and content streams, its rotation and the thumbnail
+width. Reopening a file that was seen before therefore serves thumbnails
+from disk without rasterising anything, and an edited page simply misses.
+"""
+import hashlib
+import os
+import sys
+import threading
+import uuid
+
+from PIL import Image
+
+from .render import THUMB_WIDTH, render_thumbnail
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+_FINGERPRINT_CHUNK = 1024 * 1024
+
+
+def user_cache_dir(app="pdfy"):
+    """Platform cache directory for app (not created)."""
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~\\AppData\\Local")
+        return os.path.join(base, app, "Cache")
+    if sys.platform == "darwin":
+        return os.path.join(os.path.expanduser("~/Library/Caches"), app)
+    return os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), app)
+
+
+def file_fingerprint(path):
+    """Cheap identity of a file: its size plus hashes of the first and last megabyte."""
+    h = hashlib.sha1()
+    size = os.path.getsize(path)
+    h.update(str(size).encode())
+    with open(path, "rb") as f:
+        h.update(f.read(_FINGERPRINT_CHUNK))
+        if size > _FINGERPRINT_CHUNK:
+            f.seek(max(_FINGERPRINT_CHUNK, size - _FINGERPRINT_CHUNK))
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def page_fingerprint(page):
+    """Hash of a page's dictionary and raw content streams (no rendering involved)."""
+    doc = page.parent
+    h = hashlib.sha1(doc.xref_object(page.xref, compressed=True).encode())
+    for xref in page.get_contents():
+        h.update(doc.xref_stream_raw(xref) or b"")
+    return h.hexdigest()
+
+
+class ThumbnailCache:
+    """Size-capped thumbnail store; least recently used files are evicted first.
+
+    Recency is tracked through file modification times, which get() refreshes.
+    Safe to use from the thumbnail worker threads.
+    """
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory or os.path.join(user_cache_dir(), "thumbnails")
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._total = sum(entry.stat().st_size for entry in self._entries())
+
+    def key(self, doc_fingerprint, page, width):
+        raw = f"{doc_fingerprint}:{page_fingerprint(page)}:{page.rotation}:{width}"
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with Image.open(path) as img:
+                img.load()
+            os.utime(path)  # Mark as recently used
+            return img
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, img):
+        path = self._path(key)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            img.save(temp_path, "PNG")
+            os.replace(temp_path, path)  # Readers never see a partial file
+            size = os.path.getsize(path)
+        except OSError:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            self._total += size
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def thumbnail(self, page, doc_fingerprint, width=THUMB_WIDTH, displaylist=None):
+        """render_thumbnail(page, width), served from the cache when possible.
+
+        displaylist, a recording of page, is rendered instead of page on a miss.
+        """
+        key = self.key(doc_fingerprint, page, width)
+        img = self.get(key)
+        if img is None:
+            img = render_thumbnail(displaylist or page, width)
+            self.put(key, img)
+        return img
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".png")
+
+    def _entries(self):
+        for sub in os.scandir(self.directory):
+            if sub.is_dir():
+                for entry in os.scandir(sub.path):
+                    if entry.name.endswith(".png"):
+                        yield entry
+
+    def _evict(self):
+        # Drop the oldest entries until comfortably under the cap
+        entries = sorted(self._entries(), key=lambda entry: entry.stat().st_mtime)
+        self._total = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if self._total <= self.max_bytes * 0.8:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                self._total -= size
+            except OSError:
+                pass
@@ -0,0 +1,44 @@
+import io
+
+import fitz  # PyMuPDF
+import pytest
+from PIL import Image
+
+
+def make_pdf(path, page_count=5):
+    """Write a PDF whose page i reads "Page i+1" and return its path as a string."""
+    doc = fitz.open()
+    for i in range(page_count):
+        doc.new_page().insert_text((72, 72), f"Page {i + 1}")
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+def make_image_pdf(path, page_count=3, size=600):
+    """Write a PDF with one noisy PNG image per page, shown at about 145 dpi, and return its path."""
+    doc = fitz.open()
+    for i in range(page_count):
+        page = doc.new_page()
+        buffer = io.BytesIO()
+        Image.effect_noise((size, size), 40 + i).convert("RGB").save(buffer, "PNG")
+        page.insert_image(fitz.Rect(72, 100, 72 + 0.5 * page.rect.width, 100 + 0.5 * page.rect.height),
+                          stream=buffer.getvalue())
+        page.insert_text((72, 72), f"Page {i + 1}")
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+def page_texts(doc):
+    return [page.get_text().strip() for page in doc]
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    return make_pdf(tmp_path / "doc.pdf")
+
+
+@pytest.fixture
+def image_pdf_path(tmp_path):
+    return make_image_pdf(tmp_path / "images.pdf")
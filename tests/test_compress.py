@@ -0,0 +1,142 @@
+import io
+import os
+import threading
+import time
+
+import fitz  # PyMuPDF
+import pytest
+from PIL import Image
+
+from pdfy import CompressionCancelled, DocumentSession, compress_pdf
+from pdfy.compress import TARGET_ATTEMPTS, CompressionPlanner, downsample_images
+
+from conftest import page_texts
+
+
+def _pages(path):
+    doc = fitz.open(path)
+    try:
+        return page_texts(doc), [page.rotation for page in doc]
+    finally:
+        doc.close()
+
+
+@pytest.mark.parametrize("target_mb", [None, 0.5, 100])
+def test_compress_includes_unsaved_edits(image_pdf_path, tmp_path, target_mb):
+    output = str(tmp_path / "out.pdf")
+    session = DocumentSession.open(image_pdf_path)
+    try:
+        session.rotate_page(0)
+        session.delete_pages([1])
+        result = session.compress(output, "medium", target_mb, workers=1)
+    finally:
+        session.close()
+    assert _pages(output) == (["Page 1", "Page 3"], [90, 0])
+    assert result['size'] == os.path.getsize(output)
+
+
+def test_compress_over_own_file(image_pdf_path):
+    original_size = os.path.getsize(image_pdf_path)
+    session = DocumentSession.open(image_pdf_path)
+    try:
+        session.rotate_page(2)
+        session.compress(image_pdf_path, "low", workers=1)
+    finally:
+        session.close()
+    assert os.path.getsize(image_pdf_path) < original_size
+    assert _pages(image_pdf_path) == (["Page 1", "Page 2", "Page 3"], [0, 0, 90])
+
+
+def _add_uncompressed_filler(path):
+    """Give every page a large uncompressed content stream that deflate all but removes."""
+    doc = fitz.open(path)
+    for page in doc:
+        xref = doc.get_new_xref()
+        doc.update_object(xref, "<<>>")
+        doc.update_stream(xref, b"0 0 m 10 10 l S\n" * 50000, compress=False)
+        contents = " ".join(f"{x} 0 R" for x in page.get_contents() + [xref])
+        doc.xref_set_key(page.xref, "Contents", f"[{contents}]")
+    doc.saveIncr()
+    doc.close()
+
+
+def _rewritten_size(path, setting=None):
+    doc = fitz.open(path)
+    try:
+        if setting:
+            downsample_images(doc, *setting)
+        return len(doc.tobytes(garbage=4, deflate=True))
+    finally:
+        doc.close()
+
+
+@pytest.mark.parametrize("search", [False, True])
+def test_target_keeps_the_mildest_fitting_setting(image_pdf_path, tmp_path, search):
+    _add_uncompressed_filler(image_pdf_path)
+    sizes = [_rewritten_size(image_pdf_path, setting) for setting in TARGET_ATTEMPTS]
+    # Aim between the second and third attempts, far below the size on disk
+    target = (sizes[1] + sizes[2]) / 2
+    assert target < os.path.getsize(image_pdf_path) / 4
+    result = compress_pdf(image_pdf_path, str(tmp_path / "out.pdf"), target_mb=target / (1024 * 1024),
+                          workers=1, search=search)
+    assert sizes[3] < result['size'] <= target
+    if not search:
+        assert (result['dpi'], result['quality']) == TARGET_ATTEMPTS[2]
+
+
+def test_target_met_by_deflate_alone_skips_images(image_pdf_path, tmp_path):
+    _add_uncompressed_filler(image_pdf_path)
+    target = _rewritten_size(image_pdf_path) * 1.05
+    result = compress_pdf(image_pdf_path, str(tmp_path / "out.pdf"), target_mb=target / (1024 * 1024), workers=1)
+    assert result['size'] <= target
+    assert (result['dpi'], result['passes']) == (None, 1)
+
+
+def test_kept_counts_images_for_the_applied_setting():
+    # Two-tone noise deflates far better than it JPEG-encodes at a mild downscale
+    doc = fitz.open()
+    for _ in range(2):
+        buffer = io.BytesIO()
+        Image.effect_noise((1300, 1300), 100).point(lambda v: 255 if v > 128 else 0).save(buffer, "PNG")
+        doc.new_page().insert_image(fitz.Rect(0, 0, 595, 842), stream=buffer.getvalue())
+    planner = CompressionPlanner(doc, TARGET_ATTEMPTS, workers=1)
+    assert planner.stats['kept'] == 2
+    planner.apply(96, 60)
+    assert planner.stats['kept'] == 2  # Once per image, not once per setting it was tried at
+    planner.apply(50, 30)
+    assert planner.stats['kept'] == 0
+    doc.close()
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_progress_reports_every_image_and_pass(image_pdf_path, tmp_path, workers):
+    events = []
+    compress_pdf(image_pdf_path, str(tmp_path / "out.pdf"), "medium", workers=workers,
+                 progress=lambda *event: events.append(event))
+    images = [event for event in events if event[0] == 'images']
+    assert [done for _, done, _ in images] == [1, 2, 3]
+    assert all(total == 3 for _, _, total in images)
+    assert events[-1] == ('pass', 1, None)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_cancel_raises_and_leaves_no_output(image_pdf_path, tmp_path, workers):
+    output = tmp_path / "out.pdf"
+    cancel = threading.Event()
+
+    def progress(stage, done, total):
+        if stage == 'images':
+            cancel.set()
+
+    with pytest.raises(CompressionCancelled):
+        compress_pdf(image_pdf_path, str(output), "medium", workers=workers, progress=progress, cancel=cancel)
+    assert not output.exists()
+
+
+def test_pooled_cancel_does_not_wait_for_every_image(image_pdf_path, tmp_path):
+    cancel = threading.Event()
+    cancel.set()
+    start = time.perf_counter()
+    with pytest.raises(CompressionCancelled):
+        compress_pdf(image_pdf_path, str(tmp_path / "out.pdf"), "medium", workers=2, cancel=cancel)
+    assert time.perf_counter() - start < 5
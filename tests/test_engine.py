@@ -0,0 +1,59 @@
+import fitz  # PyMuPDF
+import pytest
+
+from pdfy import DocumentSession
+
+from conftest import page_texts
+
+
+def _reopen(path):
+    doc = fitz.open(path)
+    try:
+        return doc.is_repaired, page_texts(doc), [page.rotation for page in doc]
+    finally:
+        doc.close()
+
+
+@pytest.mark.parametrize("temp_copy", [False, True])
+def test_repeated_save_in_place_round_trips(pdf_path, temp_copy):
+    session = DocumentSession.open(pdf_path, temp_copy=temp_copy)
+    try:
+        session.rotate_page(0)
+        session.save_in_place()
+        session.rotate_page(1)
+        session.save_in_place()
+        session.delete_pages([2])
+        session.save_in_place()
+        session.rotate_page(0)
+        session.save_in_place()
+        assert page_texts(session.doc) == ["Page 1", "Page 2", "Page 4", "Page 5"]
+    finally:
+        session.close()
+    repaired, texts, rotations = _reopen(pdf_path)
+    assert not repaired
+    assert texts == ["Page 1", "Page 2", "Page 4", "Page 5"]
+    assert rotations == [180, 90, 0, 0]
+
+
+def test_incremental_save_appends_without_temp_copy(pdf_path):
+    session = DocumentSession.open(pdf_path)
+    try:
+        session.rotate_page(0)
+        assert session.save_in_place() == "incremental"
+        session.rotate_page(0)
+        assert session.save_in_place() == "incremental"
+    finally:
+        session.close()
+    assert _reopen(pdf_path) == (False, ["Page 1", "Page 2", "Page 3", "Page 4", "Page 5"], [180, 0, 0, 0, 0])
+
+
+def test_undo_after_save_in_place(pdf_path):
+    session = DocumentSession.open(pdf_path)
+    try:
+        session.delete_pages([1, 2])
+        session.save_in_place()
+        session.undo()
+        session.save_in_place()
+    finally:
+        session.close()
+    assert _reopen(pdf_path)[:2] == (False, ["Page 1", "Page 2", "Page 3", "Page 4", "Page 5"])
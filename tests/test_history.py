@@ -0,0 +1,85 @@
+import fitz  # PyMuPDF
+import pytest
+
+from pdfy import DocumentSession
+from pdfy.history import History
+
+from conftest import make_pdf, page_texts
+
+PAGES = ["Page 1", "Page 2", "Page 3", "Page 4", "Page 5"]
+
+
+@pytest.fixture
+def session(pdf_path):
+    session = DocumentSession.open(pdf_path)
+    yield session
+    session.close()
+
+
+def test_move_last_page_up_and_undo(session):
+    session.move_page(4, 0)
+    assert page_texts(session.doc) == ["Page 5", "Page 1", "Page 2", "Page 3", "Page 4"]
+    session.undo()
+    assert page_texts(session.doc) == PAGES
+    assert session.can_redo and not session.can_undo
+    session.redo()
+    assert page_texts(session.doc)[0] == "Page 5"
+
+
+def test_move_page_to_end_and_undo(session):
+    assert session.move_page(1, 5) == 4
+    assert page_texts(session.doc) == ["Page 1", "Page 3", "Page 4", "Page 5", "Page 2"]
+    session.undo()
+    assert page_texts(session.doc) == PAGES
+
+
+def test_failed_undo_stays_on_undo_stack():
+    class Broken:
+        def undo(self, session):
+            raise RuntimeError("boom")
+
+    history = History()
+    command = Broken()
+    history.record(command)
+    with pytest.raises(RuntimeError):
+        history.undo(None)
+    assert history.undo_stack == [command] and not history.redo_stack
+
+
+def test_delete_undo_remaps_pages(session):
+    session.delete_pages([1, 2])
+    assert [session.remap_index(i) for i in range(5)] == [0, None, None, 1, 2]
+    session.undo()
+    assert page_texts(session.doc) == PAGES
+    assert [session.remap_index(i) for i in range(3)] == [0, 3, 4]
+
+
+def _structure(doc):
+    links = [[(link['kind'], link.get('page'), link.get('uri')) for link in page.get_links()] for page in doc]
+    return [entry[:3] for entry in doc.get_toc()], links
+
+
+def test_delete_undo_restores_outline_and_links(tmp_path):
+    path = make_pdf(tmp_path / "linked.pdf")
+    doc = fitz.open(path)
+    doc.set_toc([[1, "one", 1], [1, "three", 3], [1, "five", 5]])
+    doc[0].insert_link({'kind': fitz.LINK_GOTO, 'from': fitz.Rect(72, 100, 200, 120), 'page': 2,
+                        'to': fitz.Point(0, 0)})
+    doc[2].insert_link({'kind': fitz.LINK_GOTO, 'from': fitz.Rect(72, 100, 200, 120), 'page': 3,
+                        'to': fitz.Point(0, 0)})
+    doc[2].insert_link({'kind': fitz.LINK_URI, 'from': fitz.Rect(72, 130, 200, 150), 'uri': "https://example.com"})
+    doc.saveIncr()
+    doc.close()
+
+    session = DocumentSession.open(path)
+    try:
+        before = _structure(session.doc)
+        session.delete_pages([2])
+        assert _structure(session.doc)[0] == [[1, "one", 1], [1, "five", 4]]
+        session.undo()
+        assert _structure(session.doc) == before
+        session.redo()
+        session.undo()
+        assert _structure(session.doc) == before
+    finally:
+        session.close()
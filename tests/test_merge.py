@@ -0,0 +1,73 @@
+import io
+import os
+
+import fitz  # PyMuPDF
+import pytest
+from PIL import Image
+
+from pdfy import merge_pdfs
+from pdfy.merge import dedupe_streams
+
+from conftest import make_pdf, page_texts
+
+
+def _letter(path, logo):
+    """One-page PDF showing the shared logo image plus its own text."""
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_image(fitz.Rect(72, 72, 272, 272), stream=logo)
+    page.insert_text((72, 320), path.stem)
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+@pytest.fixture
+def letters(tmp_path):
+    buffer = io.BytesIO()
+    Image.effect_noise((400, 400), 50).convert("RGB").save(buffer, "PNG")
+    return [_letter(tmp_path / f"letter{i}.pdf", buffer.getvalue()) for i in range(4)]
+
+
+def test_merge_keeps_order_and_pages(tmp_path):
+    inputs = [make_pdf(tmp_path / f"in{i}.pdf", page_count=i + 1) for i in range(3)]
+    output = str(tmp_path / "merged.pdf")
+    result = merge_pdfs(inputs, output, flush_bytes=1)  # Flush after every input
+    assert result['pages'] == 6 and result['flushes'] == 2
+    doc = fitz.open(output)
+    assert page_texts(doc) == ["Page 1", "Page 1", "Page 2", "Page 1", "Page 2", "Page 3"]
+    doc.close()
+
+
+def test_merge_stores_repeated_images_once(letters, tmp_path):
+    deduped = str(tmp_path / "deduped.pdf")
+    plain = str(tmp_path / "plain.pdf")
+    result = merge_pdfs(letters, deduped)
+    merge_pdfs(letters, plain, dedupe=False)
+    assert result['duplicates'] == 6  # The image and its ICC profile, for each repeat
+    assert result['size'] * 2 < os.path.getsize(plain)
+    doc = fitz.open(deduped)
+    xrefs = {image[0] for page in doc for image in page.get_images()}
+    assert len(xrefs) == 1
+    assert page_texts(doc) == [f"letter{i}" for i in range(4)]
+    doc.close()
+
+
+def test_dedupe_streams_leaves_distinct_images(tmp_path):
+    doc = fitz.open()
+    for seed in (1, 2):
+        buffer = io.BytesIO()
+        Image.effect_noise((64, 64), seed * 40).convert("RGB").save(buffer, "PNG")
+        doc.new_page().insert_image(fitz.Rect(0, 0, 64, 64), stream=buffer.getvalue())
+    assert dedupe_streams(doc)['duplicates'] == 0
+    doc.close()
+
+
+def test_merge_rejects_non_pdf_and_leaves_no_output(tmp_path, pdf_path):
+    bogus = tmp_path / "notes.pdf"
+    bogus.write_text("not a pdf")
+    output = tmp_path / "merged.pdf"
+    with pytest.raises(ValueError, match="notes.pdf"):
+        merge_pdfs([pdf_path, str(bogus)], str(output))
+    assert not output.exists()
+    assert [p.name for p in tmp_path.iterdir() if p.name != "doc.pdf"] == ["notes.pdf"]
@@ -0,0 +1,29 @@
+import logging
+import threading
+
+from pdfy import DocumentSession
+from pdfy.preview import PreviewRenderer
+from pdfy.render import RenderSource
+
+
+def test_render_failure_is_logged_not_printed(pdf_path, caplog, capsys, monkeypatch):
+    session = DocumentSession.open(pdf_path)
+    source = RenderSource(session)
+    failed = threading.Event()
+
+    def broken(index, generation):
+        failed.set()
+        raise RuntimeError("broken page")
+
+    monkeypatch.setattr(source, "displaylist", broken)
+    renderer = PreviewRenderer(source, prefetch=0)
+    try:
+        with caplog.at_level(logging.ERROR, logger="pdfy.preview"):
+            assert renderer.request(0, 100, 100) is None
+            assert failed.wait(5)
+            renderer.close()
+            renderer._thread.join(5)
+    finally:
+        session.close()
+    assert "Preview render of page 0 failed" in caplog.text
+    assert capsys.readouterr().out == ""
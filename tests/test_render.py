@@ -0,0 +1,15 @@
+import fitz  # PyMuPDF
+
+from pdfy.render import DisplayListCache
+
+
+def test_displaylist_cache_counts_probes_apart_from_misses(pdf_path):
+    doc = fitz.open(pdf_path)
+    cache = DisplayListCache(max_pages=2)
+    assert cache.get(doc, 0, 0, store=False) is None
+    assert cache.get(doc, 0, 0) is not None
+    assert cache.get(doc, 0, 0, store=False) is not None
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'probe_misses': 1, 'pages': 1}
+    cache.get(doc, 0, 1)  # A new generation starts empty
+    assert cache.stats()['misses'] == 2
+    doc.close()
@@ -0,0 +1,84 @@
+import pytest
+
+from pdfy import DocumentSession
+
+from conftest import make_pdf
+
+pdf_editor = pytest.importorskip("pdf_editor")
+
+
+class FakeCanvas:
+    """Just enough of tk.Canvas for ThumbnailStrip's layout, recording nothing but item ids."""
+
+    def __init__(self, height=400):
+        self.height = height
+        self._next_item = 0
+
+    def configure(self, **options):
+        pass
+
+    def bind(self, *args):
+        pass
+
+    def yview_moveto(self, fraction):
+        pass
+
+    def canvasy(self, y):
+        return y
+
+    def winfo_height(self):
+        return self.height
+
+    def cget(self, option):
+        return "200"
+
+    def _create(self, *args, **options):
+        self._next_item += 1
+        return self._next_item
+
+    create_rectangle = create_image = create_text = _create
+
+    def tag_lower(self, item):
+        pass
+
+    def itemconfigure(self, item, **options):
+        pass
+
+    def coords(self, item, *args):
+        pass
+
+
+@pytest.fixture
+def strip(monkeypatch):
+    monkeypatch.setattr(pdf_editor.ThumbnailStrip, "_photo", lambda self, pil_img: ("photo", pil_img))
+    views = []
+    strip = pdf_editor.ThumbnailStrip(FakeCanvas(), None, None, None, lambda first, last: views.append((first, last)))
+    strip.views = views
+    return strip
+
+
+def test_remap_moves_thumbnails_with_their_pages(strip, tmp_path):
+    session = DocumentSession.open(make_pdf(tmp_path / "doc.pdf", page_count=10))
+    strip.reset(len(session))
+    for index in range(10):
+        strip.set_image(index, f"thumb {index + 1}")
+    photos = {index: strip.images[index][1] for index in range(10)}
+    session.delete_pages([3])
+    strip.remap(len(session), session.remap_index)
+    session.close()
+
+    assert strip.page_count == 9
+    assert [strip.source_image(i) for i in range(9)] == [
+        "thumb 1", "thumb 2", "thumb 3", "thumb 5", "thumb 6", "thumb 7", "thumb 8", "thumb 9", "thumb 10"]
+    # Moved, not re-rendered
+    assert strip.images[3][1] is photos[4]
+    assert strip.views[-1][0] == 0
+
+
+def test_remap_drops_changed_pages(strip):
+    strip.reset(3)
+    for index in range(3):
+        strip.set_image(index, f"thumb {index + 1}")
+    strip.remap(3, lambda old: None if old == 1 else old)  # Page 2 was rotated
+    assert not strip.has_image(1)
+    assert strip.has_image(0) and strip.has_image(2)